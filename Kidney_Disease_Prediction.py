@@ -1,3 +1,9 @@
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import time
 import warnings
 warnings.filterwarnings("ignore")
 import pandas as pd
@@ -22,14 +28,32 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.neighbors import KNeighborsClassifier
 import xgboost as xgb
 
+from kidney_preprocessing import KidneyPreprocessingPipeline, PIPELINE_FILENAME
+from model_registry import publish_model
+from hyperparameter_search import search_family, space_key, SEARCH_SPACES
+from training_cache import TrainingCache, cache_key, data_key, forest_key, TRAINING_CACHE_DIR, DEFAULT_MAX_BYTES
+from serving_profile import measure_serving
+from parallel_training import train_models, cache_folds, cross_validate_models, benchmark_model
+from forest_compaction import compact_forest, print_report, save_report, REPORT_FILENAME
+from incremental_learning import (
+    INCREMENTAL_MODELS, INCREMENTAL_FILENAME, DRIFT_REPORT_FILENAME, update, evaluate, replay,
+    print_report as print_incremental_report, save_report as save_incremental_report
+)
+
 
 class KidneyDiseaseModelTrainer():
-    def __init__(self, file_path, target_col='classification'):
+    def __init__(self, file_path, target_col='classification', raw_file_path='kidney_disease.csv',
+                 cache_dir=TRAINING_CACHE_DIR, cache_max_bytes=DEFAULT_MAX_BYTES):
         """
         Initialisation de la classe avec chargement des données et prétraitement.
+        `raw_file_path` est le jeu de données brut, utilisé pour ajuster le
+        pipeline de prétraitement sauvegardé avec le meilleur modèle.
+        Les modèles entraînés et leurs métriques sont gardés dans `cache_dir`
+        (au plus `cache_max_bytes` octets ; None = pas de cache).
         """
         self.file_path = file_path
         self.target_col = target_col
+        self.raw_file_path = raw_file_path
         self.models = {
             "Decision Tree": DecisionTreeClassifier(),
             "Random Forest": RandomForestClassifier(),
@@ -39,6 +63,11 @@ class KidneyDiseaseModelTrainer():
             "XGBoost": xgb.XGBClassifier()
         }
         self.results = {}
+        self.cv_results = {}
+        self.search_results = {}
+        self.cv_folds = None
+        self.compaction_report = None
+        self.cache = TrainingCache(cache_dir, cache_max_bytes) if cache_dir else None
 
     def load_and_preprocess_data(self):
         """
@@ -58,50 +87,272 @@ class KidneyDiseaseModelTrainer():
         # Vérifier la répartition des classes avant équilibrage
         print("Répartition avant équilibrage :", Counter(y))
 
+        # Données non normalisées, pour la validation croisée (normalisation propre à chaque pli)
+        self.X = X.to_numpy(dtype=np.float64)
+        self.y = y.to_numpy()
+
 
         # Appliquer MinMaxScaler après équilibrage
         scaler = MinMaxScaler(feature_range=(-1, 1))
         X_scaled = scaler.fit_transform(X)
+        self.scaler = scaler
 
         # Séparer en ensemble d'entraînement et de test AVANT l'équilibrage
         self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(X_scaled, y, test_size=0.3, random_state=42)
 
-    def train_and_evaluate(self):
+        # Clés du cache : tableaux normalisés et découpés (données, scaler et découpage compris)
+        self.data_key = data_key(self.X_train, self.y_train, self.X_test, self.y_test)
+        self.cv_data_key = data_key(self.X, self.y)
+
+    def cached(self, stage, model, data, compute, **options):
+        """
+        Résultat de `compute()` pour cette étape, ce modèle et ces données :
+        relu dans le cache s'il y est (sans rien recalculer), sinon calculé puis
+        mis en cache. Retourne (résultat, trouvé dans le cache).
+        """
+        if self.cache is None:
+            return compute(), False
+        key = cache_key(stage, model, data, **options)
+        value = self.cache.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.cache.put(key, value)
+        return value, False
+
+    def clear_cache(self):
+        """
+        Invalide tout le cache : les prochains appels réentraînent tous les modèles.
         """
-        Entraîne plusieurs modèles et évalue leurs performances.
+        n_entries = self.cache.clear() if self.cache is not None else 0
+        print(f"🗑️ Cache d'entraînement vidé ({n_entries} entrées)")
+        return n_entries
+
+    def tune_hyperparameters(self, families=None, n_jobs=-1, cv=3, random_state=42):
         """
+        Recherche d'hyperparamètres par successive halving (sur X_train seulement)
+        pour chaque famille de SEARCH_SPACES, configurations évaluées en parallèle
+        sur `n_jobs` processus. La meilleure configuration remplace le modèle par
+        défaut ; elle est enregistrée dans `self.search_results` avec son score et
+        le coût de la recherche.
+        """
+        families = families or [name for name in self.models if name in SEARCH_SPACES]
+        for model_name in families:
+            print(f"\n🔎 Recherche d'hyperparamètres : {model_name}")
+            (model, report), hit = self.cached(
+                "search", self.models[model_name], self.data_key,
+                lambda: search_family(
+                    self.models[model_name], SEARCH_SPACES[model_name], self.X_train, self.y_train,
+                    n_jobs=n_jobs, cv=cv, random_state=random_state
+                ),
+                space=space_key(SEARCH_SPACES[model_name]), cv=cv, random_state=random_state
+            )
+            self.models[model_name] = model
+            self.search_results[model_name] = dict(report, cached=hit)
+            print(
+                f"{'♻️' if hit else '✅'} {model_name}{' (cache)' if hit else ''} - F1-score ({cv} plis): {report['best_score']:.4f} | {report['best_params']}\n"
+                f"⏱️ {report['n_evaluations']} évaluations ({' -> '.join(map(str, report['n_candidates']))} configurations)"
+                f" | durée {report['wall_time_s']:.2f} s | entraînement cumulé {report['fit_time_s']:.2f} s"
+            )
+
+        return self.search_results
+
+    def train_and_evaluate(self, n_workers=None):
+        """
+        Entraîne et évalue les modèles en parallèle, un processus par modèle
+        (au plus `n_workers`, un par cœur par défaut) ; les cœurs sont partagés
+        entre les modèles entraînés en même temps (`n_jobs`, threads BLAS / OpenMP).
+        Durée réelle, temps CPU et pic mémoire de chaque modèle sont ajoutés à ses résultats.
+        Les modèles déjà entraînés sur les mêmes données avec les mêmes paramètres
+        sont relus dans le cache au lieu d'être réentraînés.
+        """
+        started = time.perf_counter()
+        results = {}
+        keys = {}
         for model_name, model in self.models.items():
-            print(f"\n🔹 Entraînement du modèle : {model_name}")
-
-            # Entraînement du modèle
-            model.fit(self.X_train, self.y_train)
-
-            # Prédictions
-            y_pred = model.predict(self.X_test)
-
-            # Évaluation des performances
-            accuracy = accuracy_score(self.y_test, y_pred)
-            f1 = f1_score(self.y_test, y_pred, average='weighted')  # Calcul du F1-score
-            conf_matrix = confusion_matrix(self.y_test, y_pred)
-            class_report = classification_report(self.y_test, y_pred)
-
-            # Stocker les résultats
-            self.results[model_name] = {
-                "accuracy": accuracy,
-                "f1_score": f1,
-                "confusion_matrix": conf_matrix,
-                "classification_report": class_report
-            }
+            if self.cache is None:
+                break
+            keys[model_name] = cache_key("train", model, self.data_key)
+            cached = self.cache.get(keys[model_name])
+            if cached is not None:
+                self.models[model_name], result = cached
+                results[model_name] = dict(result, cached=True)
+                print(f"♻️ {model_name} (cache) - Accuracy: {result['accuracy']:.4f} | F1-score: {result['f1_score']:.4f}")
+
+        to_train = {model_name: model for model_name, model in self.models.items() if model_name not in results}
+        if to_train:
+            print(f"\n🔹 Entraînement des modèles : {', '.join(to_train)}")
+        for model_name, model, result in train_models(
+            to_train, self.X_train, self.y_train, self.X_test, self.y_test, n_workers=n_workers
+        ):
+            # Le modèle entraîné revient du processus de calcul
+            self.models[model_name] = model
+            results[model_name] = dict(result, cached=False)
+            if self.cache is not None:
+                self.cache.put(keys[model_name], (model, result))
 
             # Affichage des résultats
-            print(f"✅ {model_name} - Accuracy: {accuracy:.4f} | F1-score: {f1:.4f}")
-            print("\nMatrice de confusion :\n", conf_matrix)
-            print("\nRapport de classification :\n", class_report)
+            print(f"\n✅ {model_name} - Accuracy: {result['accuracy']:.4f} | F1-score: {result['f1_score']:.4f}")
+            memory = f"{result['peak_memory_mb']:.0f} Mo" if result["peak_memory_mb"] is not None else "n/a"
+            print(
+                f"⏱️ {result['n_threads']} thread(s) | durée {result['wall_time_s']:.3f} s"
+                f" | CPU {result['cpu_time_s']:.3f} s | pic mémoire {memory}"
+            )
+            print(
+                f"🚀 predict : 1 ligne {result['predict_1_ms']:.3f} ms | {result['predict_batch_rows']} lignes"
+                f" {result['predict_batch_ms']:.1f} ms | taille {result['size_bytes'] / 1024:.1f} Ko"
+            )
+            print("\nMatrice de confusion :\n", result["confusion_matrix"])
+            print("\nRapport de classification :\n", result["classification_report"])
+
+        # Stocker les résultats dans l'ordre des modèles
+        self.results = {model_name: results[model_name] for model_name in self.models}
+        print(f"\n⏱️ Entraînement de {len(self.models)} modèles en {time.perf_counter() - started:.2f} s")
+
+    def prepare_folds(self, n_splits=5, random_state=42):
+        """
+        Plis stratifiés et tableaux normalisés de chaque pli, calculés une seule
+        fois puis réutilisés par tous les modèles et les appels suivants.
+        """
+        key = (n_splits, random_state)
+        if self.cv_folds is not None and self.cv_folds["key"] == key:
+            return self.cv_folds
+
+        workdir = tempfile.mkdtemp(prefix="kidney_cv_")
+        atexit.register(shutil.rmtree, workdir, True)
+        folds, paths = cache_folds(self.X, self.y, workdir, n_splits=n_splits, random_state=random_state)
+        self.cv_folds = {"key": key, "folds": folds, "paths": paths}
+        return self.cv_folds
+
+    def cross_validate(self, n_splits=5, n_workers=None, random_state=42):
+        """
+        Validation croisée stratifiée de tous les modèles, plis et modèles en
+        parallèle. Moyenne et variance de l'accuracy et du F1 de chaque modèle
+        sont stockées dans `self.cv_results` ; get_best_model s'en sert alors
+        plutôt que de l'unique découpage 70/30.
+        """
+        started = time.perf_counter()
+        scores = {}
+        keys = {}
+        for model_name, model in self.models.items():
+            if self.cache is None:
+                break
+            keys[model_name] = cache_key("cv", model, self.cv_data_key, n_splits=n_splits, random_state=random_state)
+            cached = self.cache.get(keys[model_name])
+            if cached is not None:
+                scores[model_name] = cached
+
+        # Plis calculés seulement s'il reste des modèles à évaluer
+        to_evaluate = {model_name: model for model_name, model in self.models.items() if model_name not in scores}
+        print(f"\n🔁 Validation croisée ({n_splits} plis) : {', '.join(to_evaluate) or 'tout est en cache'}")
+        if to_evaluate:
+            cv_folds = self.prepare_folds(n_splits, random_state)
+            evaluated = {model_name: [None] * n_splits for model_name in to_evaluate}
+            for model_name, fold, result in cross_validate_models(to_evaluate, cv_folds["paths"], n_workers=n_workers):
+                evaluated[model_name][fold] = result
+            for model_name, folds in evaluated.items():
+                scores[model_name] = folds
+                if self.cache is not None:
+                    self.cache.put(keys[model_name], folds)
+        scores = {model_name: scores[model_name] for model_name in self.models}
+
+        self.cv_results = {}
+        for model_name, folds in scores.items():
+            accuracies = np.array([fold["accuracy"] for fold in folds])
+            f1_scores = np.array([fold["f1_score"] for fold in folds])
+            self.cv_results[model_name] = {
+                "accuracy_mean": accuracies.mean(),
+                "accuracy_var": accuracies.var(),
+                "f1_mean": f1_scores.mean(),
+                "f1_var": f1_scores.var(),
+                "wall_time_s": sum(fold["wall_time_s"] for fold in folds),
+                "cpu_time_s": sum(fold["cpu_time_s"] for fold in folds),
+                "folds": folds
+            }
+            res = self.cv_results[model_name]
+            print(
+                f"✅ {model_name} - Accuracy: {res['accuracy_mean']:.4f} (var {res['accuracy_var']:.2e})"
+                f" | F1-score: {res['f1_mean']:.4f} (var {res['f1_var']:.2e})"
+            )
+        print(f"⏱️ Validation croisée en {time.perf_counter() - started:.2f} s")
+        return self.cv_results
+
+    def compact_random_forest(self, tolerance=0.01, validation_size=0.25, report_filename=REPORT_FILENAME, **grids):
+        """
+        Compacte la forêt aléatoire entraînée : moins d'arbres, profondeur limitée
+        et élagage coût-complexité. La plus petite forêt dont le F1, mesuré sur
+        une partie de validation de X_train (`validation_size`), reste à moins de
+        `tolerance` de l'originale la remplace (résultats sur X_test compris) ; le
+        rapport latence / taille / F1 de chaque candidate est affiché et sauvegardé.
+        """
+        (compact, report), hit = self.cached(
+            "compact", self.models["Random Forest"], self.data_key,
+            lambda: compact_forest(
+                self.models["Random Forest"], self.X_train, self.y_train, tolerance=tolerance,
+                validation_size=validation_size, **grids
+            ),
+            tolerance=tolerance, validation_size=validation_size, grids=grids, forest=forest_key(self.models["Random Forest"])
+        )
+        if hit:
+            print("\n♻️ Compaction de la forêt relue dans le cache")
+        print_report(report)
+        save_report(report, report_filename)
+        print(f"📁 Rapport de compaction sauvegardé sous : {report_filename}")
+
+        # Les résultats de la forêt retenue remplacent ceux de la forêt d'origine
+        # (coûts d'entraînement de la forêt d'origine, coûts de prédiction de la forêt compactée)
+        y_pred = compact.predict(self.X_test)
+        self.models["Random Forest"] = compact
+        self.results["Random Forest"] = dict(
+            self.results.get("Random Forest", {}),
+            accuracy=accuracy_score(self.y_test, y_pred),
+            f1_score=f1_score(self.y_test, y_pred, average='weighted'),
+            confusion_matrix=confusion_matrix(self.y_test, y_pred),
+            classification_report=classification_report(self.y_test, y_pred),
+            compacted=True,
+            **benchmark_model(compact, self.X_test)
+        )
+        self.compaction_report = report
+        print(f"✅ Random Forest compactée ({report['selected']}) - F1-score: {self.results['Random Forest']['f1_score']:.4f}")
+
+        return compact, report
+
+    def benchmark_report(self):
+        """
+        Une ligne par modèle : qualité (accuracy, F1, F1 moyen en validation
+        croisée) et coût de sa mise en service (entraînement, latence de
+        predict, mémoire, taille du fichier).
+        """
+        columns = [
+            "accuracy", "f1_score", "fit_time_s", "cpu_time_s", "n_threads", "peak_memory_mb", "fit_memory_mb",
+            "predict_1_ms", "predict_batch_rows", "predict_batch_ms", "predict_peak_memory_mb", "predict_memory_mb",
+            "size_bytes", "cached"
+        ]
+        rows = []
+        for model_name, res in self.results.items():
+            row = {"model": model_name}
+            row.update({column: res.get(column) for column in columns})
+            if model_name in self.cv_results:
+                row["cv_f1_mean"] = self.cv_results[model_name]["f1_mean"]
+                row["cv_f1_var"] = self.cv_results[model_name]["f1_var"]
+            rows.append(row)
+        return rows
+
+    def save_benchmark_report(self, json_path="model_benchmark_report.json", csv_path="model_benchmark_report.csv"):
+        rows = self.benchmark_report()
+        with open(json_path, "w") as f:
+            json.dump(rows, f, indent=2, default=lambda value: value.item() if hasattr(value, "item") else str(value))
+        pd.DataFrame(rows).to_csv(csv_path, index=False)
+        print(f"📁 Rapport de performances sauvegardé sous : {json_path} et {csv_path}")
+        return rows
 
     def compare_models(self):
         """
-        Compare les modèles sur la base de l'accuracy et du f1_score.
+        Compare les modèles sur la base de l'accuracy et du f1_score, et
+        sauvegarde le rapport de performances (qualité et coût) de chaque modèle.
         """
+        self.save_benchmark_report()
+
         accuracies = {model: res["accuracy"] for model, res in self.results.items()}
         f1_scores = {model: res["f1_score"] for model, res in self.results.items()}
 
@@ -127,34 +378,263 @@ class KidneyDiseaseModelTrainer():
         plt.tight_layout()
         plt.show()
 
-    def get_best_model(self):
+    def select_model(self, max_latency_ms=None, max_size_bytes=None, max_rss_mb=None, latency_percentile=99,
+                     engine=None):
         """
-        Retourne et sauvegarde le meilleur modèle en fonction de l'accuracy et du f1_score.
+        Choisit le modèle au meilleur score qui respecte les contraintes de service :
+        latence d'une prédiction d'une ligne au percentile `latency_percentile`,
+        taille du fichier et mémoire résidente d'un worker qui le sert. Les
+        modèles sont mesurés sur les vraies lignes de X_test dans un processus
+        neuf (serving_profile), chargés avec le moteur d'inférence de l'API
+        (`engine`, KIDNEY_INFERENCE_ENGINE par défaut), du meilleur score au moins
+        bon, jusqu'au premier qui convient. Un modèle dont la mémoire ne peut pas
+        être mesurée (hors Linux) est écarté si `max_rss_mb` est demandé. Score : F1 moyen de la validation croisée si elle a été
+        faite (puis F1 sur X_test en cas d'égalité), sinon F1 sur X_test.
+
+        Retourne le nom du modèle et le détail du choix (contraintes, mesures,
+        modèles écartés et raison), ou lève ValueError si aucun ne convient.
+        """
+        if self.cv_results:
+            score_name = "cv_f1_mean"
+            ranking = sorted(self.results, key=lambda k: (self.cv_results[k]["f1_mean"], self.results[k]["f1_score"]), reverse=True)
+        else:
+            score_name = "f1_score"
+            ranking = sorted(self.results, key=lambda k: self.results[k]["f1_score"], reverse=True)
+        engine = engine or os.environ.get("KIDNEY_INFERENCE_ENGINE", "sklearn")
+        constraints = {
+            "engine": engine, "max_latency_ms": max_latency_ms, "latency_percentile": latency_percentile,
+            "max_size_bytes": max_size_bytes, "max_rss_mb": max_rss_mb
+        }
+        selection = {"score": score_name, "constraints": constraints, "rejected": []}
+
+        if max_latency_ms is None and max_size_bytes is None and max_rss_mb is None:
+            selection["reason"] = f"meilleur {score_name} (aucune contrainte de service)"
+            return ranking[0], selection
+
+        for model_name in ranking:
+            serving = measure_serving(self.models[model_name], self.X_test, percentile=latency_percentile, engine=engine)
+            violations = []
+            if max_latency_ms is not None and serving["latency_ms"] > max_latency_ms:
+                violations.append(f"latence p{latency_percentile:g} {serving['latency_ms']:.3f} ms > {max_latency_ms} ms")
+            if max_size_bytes is not None and serving["size_bytes"] > max_size_bytes:
+                violations.append(f"taille {serving['size_bytes']} octets > {max_size_bytes} octets")
+            if max_rss_mb is not None and serving["peak_rss_mb"] is None:
+                violations.append("mémoire non mesurable sur cette plateforme")
+            elif max_rss_mb is not None and serving["peak_rss_mb"] > max_rss_mb:
+                violations.append(f"mémoire {serving['peak_rss_mb']:.1f} Mo > {max_rss_mb} Mo")
+
+            if violations:
+                print(f"⛔ {model_name} écarté : {', '.join(violations)}")
+                selection["rejected"].append({"model": model_name, "violations": violations, "serving": serving})
+                continue
+
+            selection["serving"] = serving
+            rejected = ", ".join(r["model"] for r in selection["rejected"])
+            selection["reason"] = (
+                f"meilleur {score_name} parmi les modèles qui respectent les contraintes"
+                + (f" ({rejected} écarté(s))" if rejected else "")
+                + f" : moteur {serving['engine']}, latence p{latency_percentile:g} {serving['latency_ms']:.3f} ms, taille {serving['size_bytes']} octets"
+                + (f", mémoire {serving['peak_rss_mb']:.1f} Mo" if serving["peak_rss_mb"] is not None else "")
+            )
+            return model_name, selection
+
+        raise ValueError(
+            "Aucun modèle ne respecte les contraintes de service : "
+            + "; ".join(f"{r['model']} ({', '.join(r['violations'])})" for r in selection["rejected"])
+        )
+
+    def get_best_model(self, registry_dir=None, max_latency_ms=None, max_size_bytes=None, max_rss_mb=None,
+                       latency_percentile=99, engine=None):
+        """
+        Retourne et sauvegarde le meilleur modèle en fonction de l'accuracy et du f1_score,
+        parmi ceux qui respectent les contraintes de service éventuelles (voir select_model).
+        Les métadonnées du modèle, dont la raison du choix, sont sauvegardées à côté de lui.
+        Avec `registry_dir`, le modèle et son prétraitement sont aussi publiés comme
+        nouvelle version du registre : l'API en cours d'exécution bascule dessus sans redémarrer.
         """
-        best_model = max(self.results, key=lambda k: self.results[k]["f1_score"])
+        best_model, selection = self.select_model(
+            max_latency_ms, max_size_bytes, max_rss_mb, latency_percentile, engine
+        )
         best_model_instance = self.models[best_model]
 
         print(f"\n🏆 Le meilleur modèle est : {best_model} avec une Accuracy de {self.results[best_model]['accuracy']:.4f} et un F1-score de {self.results[best_model]['f1_score']:.4f}")
+        if self.cv_results:
+            cv = self.cv_results[best_model]
+            print(f"🔁 Validation croisée : F1-score moyen {cv['f1_mean']:.4f} (variance {cv['f1_var']:.2e})")
+        print(f"📝 Raison : {selection['reason']}")
 
         # Sauvegarde du meilleur modèle en .pkl
         model_filename = f"best_model_{best_model}.pkl"
         joblib.dump(best_model_instance, model_filename)
         print(f"📁 Modèle sauvegardé sous : {model_filename}")
 
+        metadata = {
+            "model": best_model,
+            "accuracy": self.results[best_model]["accuracy"],
+            "f1_score": self.results[best_model]["f1_score"],
+            "selection": selection
+        }
+        if best_model in self.search_results:
+            metadata["hyperparameters"] = self.search_results[best_model]["best_params"]
+        if self.cv_results:
+            metadata["cv_f1_mean"] = self.cv_results[best_model]["f1_mean"]
+            metadata["cv_f1_var"] = self.cv_results[best_model]["f1_var"]
+        if best_model == "Random Forest" and self.compaction_report is not None:
+            metadata["compaction"] = self.compaction_report["selected"]
+        metadata_filename = f"best_model_{best_model}.metadata.json"
+        with open(metadata_filename, "w") as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
+        print(f"📁 Métadonnées sauvegardées sous : {metadata_filename}")
+
+        self.save_preprocessing_pipeline()
+
+        if registry_dir is not None:
+            version = publish_model(model_filename, PIPELINE_FILENAME, registry_dir=registry_dir, metadata=metadata)
+            print(f"📦 Version {version} publiée dans le registre : {registry_dir}")
+
         return best_model, best_model_instance
+
+    def start_incremental(self, model_names=None, filename=INCREMENTAL_FILENAME):
+        """
+        Modèles incrémentaux (partial_fit, ou forêt qui ajoute des arbres à
+        chaque lot) : reprend l'état sauvegardé dans `filename` s'il existe,
+        sinon les entraîne sur X_train. Les nouveaux cas étiquetés s'ajoutent
+        ensuite avec ingest_batch, sans recharger ni réentraîner l'historique.
+        """
+        if filename is not None and os.path.exists(filename):
+            self.incremental_models = joblib.load(filename)
+            print(f"♻️ Modèles incrémentaux repris de : {filename} ({', '.join(self.incremental_models)})")
+            return self.incremental_models
+
+        classes = np.unique(self.y_train)
+        self.incremental_models = {}
+        for model_name in model_names or INCREMENTAL_MODELS:
+            model = INCREMENTAL_MODELS[model_name]()
+            update(model, self.X_train, np.asarray(self.y_train), classes)
+            self.incremental_models[model_name] = model
+            res = evaluate(model, self.X_test, self.y_test)
+            print(f"✅ {model_name} (incrémental) - Accuracy: {res['accuracy']:.4f} | F1-score: {res['f1_score']:.4f}")
+        return self.incremental_models
+
+    def ingest_batch(self, batch, pipeline_path=PIPELINE_FILENAME, filename=INCREMENTAL_FILENAME):
+        """
+        Met à jour les modèles incrémentaux avec un lot de nouveaux cas
+        étiquetés (DataFrame ou chemin d'un CSV au format de kidney_disease.csv).
+        Le lot est prétraité avec le pipeline sauvegardé (`pipeline_path`) sans
+        rien réajuster, comme le fait l'API. L'état mis à jour est sauvegardé dans
+        `filename` ; retourne l'accuracy et le F1 de chaque modèle sur X_test.
+        """
+        if isinstance(batch, str):
+            batch = pd.read_csv(batch)
+        pipeline = KidneyPreprocessingPipeline.load(pipeline_path)
+        X = pipeline.transform(batch)
+        y = pipeline.encode_target(batch[self.target_col])
+        classes = np.arange(len(pipeline.target_classes))
+
+        print(f"\n📥 Nouveau lot : {len(y)} cas étiquetés ({dict(Counter(pipeline.decode_target(y).tolist()))})")
+        results = {}
+        for model_name, model in self.incremental_models.items():
+            update_time = update(model, X, y, classes)
+            results[model_name] = dict(evaluate(model, self.X_test, self.y_test), update_time_s=update_time)
+            res = results[model_name]
+            print(
+                f"✅ {model_name} - Accuracy: {res['accuracy']:.4f} | F1-score: {res['f1_score']:.4f}"
+                f" | mise à jour {1000 * update_time:.1f} ms"
+            )
+
+        if filename is not None:
+            joblib.dump(self.incremental_models, filename)
+            print(f"📁 Modèles incrémentaux sauvegardés sous : {filename}")
+        return results
+
+    def evaluate_incremental(self, n_batches=5, initial_fraction=0.3, model_names=None,
+                             report_filename=DRIFT_REPORT_FILENAME):
+        """
+        Dérive de l'apprentissage incrémental : X_train est découpé en une part
+        initiale (`initial_fraction`) et `n_batches` lots qui arrivent l'un après
+        l'autre. Après chaque lot, chaque modèle incrémental est comparé au même
+        modèle réentraîné de zéro sur tout l'historique (accuracy et F1 sur
+        X_test, durée de la mise à jour et du réentraînement). Le rapport est
+        affiché et sauvegardé.
+        """
+        X_train, y_train = np.asarray(self.X_train), np.asarray(self.y_train)
+        n_initial = int(len(y_train) * initial_fraction)
+        batches = list(zip(np.array_split(X_train[n_initial:], n_batches), np.array_split(y_train[n_initial:], n_batches)))
+
+        print(f"\n📈 Apprentissage incrémental : {n_initial} lignes initiales puis {n_batches} lots")
+        rows = replay(
+            model_names or list(INCREMENTAL_MODELS), X_train[:n_initial], y_train[:n_initial], batches,
+            self.X_test, np.asarray(self.y_test)
+        )
+        print_incremental_report(rows)
+        save_incremental_report(rows, report_filename)
+        print(f"📁 Rapport de dérive sauvegardé sous : {report_filename}")
+        return rows
+
+    def save_preprocessing_pipeline(self, filename=PIPELINE_FILENAME):
+        """
+        Ajuste le prétraitement (modes, tables de codage) sur les données brutes,
+        reprend les min/max du scaler d'entraînement et le sauvegarde à côté du
+        modèle pour que l'API l'applique sans rien réajuster.
+        """
+        raw_data = pd.read_csv(self.raw_file_path)
+        pipeline = KidneyPreprocessingPipeline(target_col=self.target_col).fit(raw_data)
+        pipeline.set_scaler(self.scaler)
+        pipeline.save(filename)
+        print(f"📁 Pipeline de prétraitement sauvegardé sous : {filename}")
+
+        return pipeline
     
 
-model = KidneyDiseaseModelTrainer('Final_pre_processing_data.csv')
+# Les modèles sont entraînés dans des processus séparés (spawn) : le script ne s'exécute qu'en programme principal
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Entraînement et sélection du meilleur modèle")
+    parser.add_argument("--no-cache", action="store_true", help="tout réentraîner sans lire ni écrire le cache")
+    parser.add_argument("--clear-cache", action="store_true", help="vider le cache d'entraînement avant de commencer")
+    parser.add_argument("--max-latency-ms", type=float, help="latence p99 maximale d'une prédiction d'une ligne")
+    parser.add_argument("--max-size-bytes", type=int, help="taille maximale du fichier du modèle")
+    parser.add_argument("--max-rss-mb", type=float, help="mémoire résidente maximale du processus qui sert le modèle")
+    parser.add_argument("--ingest", nargs="+", metavar="CSV", help="mettre à jour les modèles incrémentaux avec ces nouveaux cas étiquetés, sans entraînement complet")
+    parser.add_argument("--evaluate-incremental", action="store_true", help="comparer l'apprentissage incrémental au réentraînement complet")
+    args = parser.parse_args()
+
+    model = KidneyDiseaseModelTrainer('Final_pre_processing_data.csv', cache_dir=None if args.no_cache else TRAINING_CACHE_DIR)
+    if args.clear_cache:
+        model.clear_cache()
+
+    # Charger et prétraiter les données
+    model.load_and_preprocess_data()
+
+    # Apprentissage incrémental : nouveaux cas étiquetés, sans réentraîner l'historique
+    # ni remplacer le modèle servi et le prétraitement sauvegardé
+    if args.ingest or args.evaluate_incremental:
+        if args.evaluate_incremental:
+            model.evaluate_incremental(n_batches=5)
+        if args.ingest:
+            model.start_incremental()
+            for batch in args.ingest:
+                model.ingest_batch(batch)
+        raise SystemExit(0)
+
+    # Chercher les hyperparamètres de chaque famille (successive halving)
+    model.tune_hyperparameters()
+
+    # Entraîner et évaluer les modèles
+    model.train_and_evaluate()
 
-# Charger et prétraiter les données
-model.load_and_preprocess_data()
+    # Compacter la forêt aléatoire (moins d'arbres, moins profonds) à F1 quasi inchangé
+    model.compact_random_forest(tolerance=0.01)
 
-# Entraîner et évaluer les modèles
-model.train_and_evaluate()
+    # Validation croisée stratifiée (5 plis) pour choisir le meilleur modèle
+    model.cross_validate(n_splits=5)
 
-# Comparer les modèles
-model.compare_models()
+    # Comparer les modèles
+    model.compare_models()
 
-# Sélectionner le meilleur modèle
-print("🏆 Meilleur modèle :")
-best_model, best_model_instance = model.get_best_model()
\ No newline at end of file
+    # Sélectionner le meilleur modèle
+    print("🏆 Meilleur modèle :")
+    best_model, best_model_instance = model.get_best_model(
+        max_latency_ms=args.max_latency_ms, max_size_bytes=args.max_size_bytes, max_rss_mb=args.max_rss_mb
+    )
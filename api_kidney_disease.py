@@ -1,36 +1,158 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-import joblib
-import uvicorn
+import time
+BOOT_STARTED = time.perf_counter()
+
+import asyncio
+import atexit
+import hmac
+import itertools
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Body, Header, Request
 import numpy as np
-import pandas as pd
-from pydantic import BaseModel
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
-from sklearn.impute import SimpleImputer
-from fastapi.responses import HTMLResponse
+from pydantic import BaseModel, ValidationError
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 
+# pandas (lecture des CSV) et numba (moteur 'numba') sont importés à la demande ;
+# sklearn seulement si le modèle sklearn doit être chargé.
+from kidney_preprocessing import KidneyPreprocessingPipeline, PatientVectorizer, INPUT_COLUMNS, PIPELINE_FILENAME
+from forest_inference import load_predictor
+from parallel_scoring import ParallelScorer
+from columnar_io import pyarrow_available, open_record_batches, batch_columns, PredictionWriter, MEDIA_TYPES
+from scoring_jobs import JobStore, JobRunner, JOBS_DIR as DEFAULT_JOBS_DIR
+from response_encoding import ResponseEncoder, MsgpackRoute
+from api_metrics import MetricsRegistry, MetricsMiddleware, RequestMetrics, THROUGHPUT_BUCKETS
+from model_registry import ModelRegistry, set_current, REGISTRY_DIR as DEFAULT_REGISTRY_DIR
+
+# Durée de chaque phase du démarrage, en secondes
+BOOT_TIMINGS = {"imports": time.perf_counter() - BOOT_STARTED}
+
+
+# Modèle servi quand le registre est vide, chargé avec ses tableaux projetés en mémoire (partagés entre workers forkés)
+MODEL_PATH = "best_model_Random_Forest.pkl"
 
-# Charger le modèle sauvegardé
-model = joblib.load("best_model_Random_Forest.pkl")  # Vérifie que ce fichier existe
+# Moteur d'inférence choisi au démarrage : 'sklearn' (par défaut), ou la forêt
+# compilée en tableaux NumPy ('numpy') ou en noyau Numba ('numba')
+INFERENCE_ENGINE = os.environ.get("KIDNEY_INFERENCE_ENGINE", "sklearn")
+
+# Registre des versions du modèle : dossier, intervalle de surveillance du
+# pointeur CURRENT (0 = pas de rechargement automatique) et nombre de versions
+# gardées en mémoire
+REGISTRY_DIR = os.environ.get("KIDNEY_MODEL_REGISTRY", DEFAULT_REGISTRY_DIR)
+REGISTRY_POLL_S = float(os.environ.get("KIDNEY_REGISTRY_POLL_S", 2))
+REGISTRY_MAX_LOADED = int(os.environ.get("KIDNEY_REGISTRY_MAX_LOADED", 3))
+
+# Jeton des endpoints d'administration du registre (/models/reload, /models/{version}/activate),
+# à passer dans l'en-tête X-Admin-Token ; sans jeton, ces endpoints sont désactivés (404)
+ADMIN_TOKEN = os.environ.get("KIDNEY_ADMIN_TOKEN")
+
+# Version servie, registre et file des travaux : créés par start_services au démarrage du serveur
+registry = None
+jobs = None
+job_runner = None
+
+@asynccontextmanager
+async def lifespan(app):
+    start_services()
+    try:
+        yield
+    finally:
+        stop_services()
 
 # Initialiser FastAPI
 app = FastAPI(
+    lifespan=lifespan,
     title="API de Prédiction des Maladies Rénales",
     description="Une API permettant de prédire si un patient est atteint d'une maladie rénale ou non à partir de ses données médicales.",
     version="1.0"
 )
+# Les routes acceptent aussi des corps de requête msgpack
+app.router.route_class = MsgpackRoute
+
 # Monter le dossier 'static' pour le CSS
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Définition des colonnes à supprimer pour éviter la multicolinéarité
-COLUMNS_TO_DROP = ['pcv', 'bu']
+# Métriques exportées sur /metrics (format Prometheus) : durée de chaque étape
+# par endpoint, requêtes en cours, débit des imports CSV
+metrics = MetricsRegistry()
+request_metrics = RequestMetrics(metrics, "kidney")
+csv_rows = metrics.counter("kidney_csv_rows_total", "Lignes prédites par /upload-csv et /upload-columnar", ["mode"])
+csv_throughput = metrics.histogram(
+    "kidney_csv_rows_per_second", "Débit de chaque import de fichier (lignes par seconde)", ["mode"], THROUGHPUT_BUCKETS
+)
+
+# Endpoints mesurés (les autres chemins ne créent pas de séries)
+METRICS_ENDPOINTS = {"/predict", "/predict-form", "/predict/batch", "/upload-csv", "/upload-columnar"}
+
+def metrics_endpoint(path):
+    if path in METRICS_ENDPOINTS:
+        return path
+    if path.startswith("/models/") and path.endswith("/predict"):
+        return "/models/{version}/predict"
+    return None
+
+app.add_middleware(MetricsMiddleware, metrics=request_metrics, endpoint_for=metrics_endpoint)
+
+# Encodeur JSON des réponses de prédiction : 'orjson' (par défaut, si installé) ou 'json'.
+# Les clients qui envoient `Accept: application/msgpack` reçoivent du msgpack (si installé).
+JSON_ENCODER = os.environ.get("KIDNEY_JSON_ENCODER", "orjson")
+encoder = ResponseEncoder(JSON_ENCODER)
+
+# Nombre maximal de patients par appel à /predict/batch
+MAX_BATCH_SIZE = int(os.environ.get("KIDNEY_MAX_BATCH_SIZE", 1000))
 
-# Définition des colonnes pour l'interface web
-INPUT_COLUMNS = [
-    "age", "bp", "sg", "al", "su", "rbc", "pc", "pcc", "ba",
-    "bgr", "bu", "sc", "sod", "pot", "hemo", "pcv", "wc", "rc",
-    "htn", "dm", "cad", "appet", "pe", "ane"
-]
+# Micro-batching des appels concurrents à /predict : au plus N lignes ou T millisecondes d'attente
+BATCHER_MAX_ROWS = int(os.environ.get("KIDNEY_BATCHER_MAX_ROWS", 64))
+BATCHER_MAX_WAIT_MS = float(os.environ.get("KIDNEY_BATCHER_MAX_WAIT_MS", 2))
+
+# Cache LRU des prédictions : nombre maximal d'entrées (0 = désactivé) et durée de vie (0 = illimitée)
+CACHE_MAX_SIZE = int(os.environ.get("KIDNEY_CACHE_SIZE", 10000))
+CACHE_TTL_S = float(os.environ.get("KIDNEY_CACHE_TTL_S", 0))
+
+# Nombre de lignes lues, prétraitées et prédites à la fois par /upload-csv?stream=true
+CSV_CHUNK_ROWS = int(os.environ.get("KIDNEY_CSV_CHUNK_ROWS", 10000))
+
+# Nombre de lignes lues, prétraitées et prédites à la fois par /upload-columnar (Parquet / Arrow)
+COLUMNAR_BATCH_ROWS = int(os.environ.get("KIDNEY_COLUMNAR_BATCH_ROWS", 65536))
+
+# Travaux de scoring asynchrones (/jobs) : dossier de la file SQLite et des résultats,
+# threads de calcul par worker, lignes par bloc enregistré, et délai au-delà duquel
+# le travail d'un worker silencieux (arrêté ou planté) est repris par un autre
+JOBS_DIR = os.environ.get("KIDNEY_JOBS_DIR", DEFAULT_JOBS_DIR)
+JOB_WORKERS = int(os.environ.get("KIDNEY_JOB_WORKERS", 1))
+JOB_CHUNK_ROWS = int(os.environ.get("KIDNEY_JOB_CHUNK_ROWS", 50000))
+JOB_LEASE_S = float(os.environ.get("KIDNEY_JOB_LEASE_S", 30))
+
+# Scoring multi-cœur de /upload-csv : nombre de processus, taille des blocs et
+# nombre de lignes en dessous duquel tout reste dans le processus courant.
+# Les processus ne partagent la mémoire du modèle qu'avec un moteur compilé
+# (KIDNEY_INFERENCE_ENGINE=numpy ou numba) ; avec 'sklearn', chacun en garde une copie
+PARALLEL_WORKERS = int(os.environ.get("KIDNEY_PARALLEL_WORKERS", os.cpu_count() or 1))
+PARALLEL_SHARD_ROWS = int(os.environ.get("KIDNEY_PARALLEL_SHARD_ROWS", 50000))
+PARALLEL_MIN_ROWS = int(os.environ.get("KIDNEY_PARALLEL_MIN_ROWS", 200000))
+
+# Calculs du modèle : threads dédiés, nombre de tâches acceptées en attente au-delà
+# (puis réponse 503) et délai conseillé au client avant de réessayer (Retry-After)
+INFERENCE_WORKERS = int(os.environ.get("KIDNEY_INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("KIDNEY_INFERENCE_QUEUE_SIZE", 32))
+RETRY_AFTER_S = int(os.environ.get("KIDNEY_RETRY_AFTER_S", 1))
+
+# Nombre maximal de lignes en attente dans le micro-batcher de /predict
+BATCHER_MAX_PENDING = int(os.environ.get("KIDNEY_BATCHER_MAX_PENDING", 1024))
+
+# Libellés des codes prédits
+LABELS = {
+    "ckd": "Maladie rénale chronique",
+    "notckd": "Pas de maladie rénale chronique"
+}
 
 # Définir la structure d'entrée attendue par l'API
 class PatientData(BaseModel):
@@ -59,80 +181,524 @@ class PatientData(BaseModel):
     pe: str
     ane: str
 
-def correct_incorrectly_encoded_columns(data):
-    # Correction des valeurs mal encodées
-    columns_to_fix = ['pcv', 'wc', 'rc', 'dm', 'cad']
-    for col in columns_to_fix:
-        if col in data.columns:
-            data[col] = data[col].astype(str).str.strip().str.replace("\t", "").replace("?", np.nan)
-    
-    # Conversion des colonnes numériques mal encodées
-    cols_to_convert = ['pcv', 'wc', 'rc']
-    for col in cols_to_convert:
-        if col in data.columns:
-            data[col] = pd.to_numeric(data[col], errors='coerce')
-    
-    # Convertit toutes les colonnes non catégoriques (object) en float       
-    for i in data.select_dtypes(exclude=['object']).columns:
-        data[i] = data[i].apply(lambda x: float(x))
-    
-    return data
-    
-# Remplace les valeurs NaN par la valeur la plus fréquente (mode) dans chaque colonne.
-def handle_missing_values(data):
-    data_clean = correct_incorrectly_encoded_columns(data)
-    mode = SimpleImputer(missing_values=np.nan, strategy="most_frequent")
-    df_clean = pd.DataFrame(mode.fit_transform(data_clean))
-    df_clean.columns = data.columns
-    
-    return df_clean
-    
-def encode_data(data):
-    data_clean = handle_missing_values(data)
-    encode_data = data_clean.apply(LabelEncoder().fit_transform)
-    
-    return encode_data  
+class ServerOverloaded(Exception):
+    """
+    File des calculs pleine : la requête est refusée tout de suite (503 + Retry-After)
+    plutôt que d'attendre sans limite.
+    """
+
+    def __init__(self, message, retry_after=RETRY_AFTER_S):
+        super().__init__(message)
+        self.retry_after = retry_after
 
-# Fonction de prétraitement des données
-def preprocess_input(data_df):
+
+class InferenceExecutor():
     """
-    Applique le même prétraitement que celui utilisé avant l'entraînement du modèle.
+    Pool de threads réservé aux calculs du modèle (prétraitement, prédiction,
+    lecture des CSV), séparé du pool par défaut de Starlette.
+
+    Au plus `max_workers` tâches s'exécutent et `max_queue` attendent ; au-delà,
+    `submit` lève ServerOverloaded sans rien mettre en file. Les tâches d'une
+    requête déjà admise (blocs suivants d'un flux, lots du micro-batcher)
+    passent avec `bounded=False`.
     """
-    try:
-        df = encode_data(data_df)
 
-        # Suppression des colonnes fortement corrélées
-        df.drop(columns=COLUMNS_TO_DROP, inplace=True)
+    def __init__(self, max_workers=INFERENCE_WORKERS, max_queue=INFERENCE_QUEUE_SIZE):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.max_in_flight = 0
 
-        # Normalisation des données
-        scaler = MinMaxScaler(feature_range=(-1, 1))
-        df_scaled = scaler.fit_transform(df)
+    def submit(self, fn, *args, bounded=True):
+        with self.lock:
+            if bounded and self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ServerOverloaded(f"Serveur surchargé : {self.in_flight} calculs en cours ou en attente")
+            self.in_flight += 1
+            self.submitted += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
 
-        return df_scaled
+        try:
+            return self.executor.submit(self._call, fn, args)
+        except BaseException:
+            self._done()
+            raise
 
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Erreur de prétraitement : {str(e)}")
-    
-@app.post("/predict")
-def predict(data: PatientData):
+    def _call(self, fn, args):
+        with self.lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self.lock:
+                self.running -= 1
+            self._done()
+
+    def _done(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    async def run(self, fn, *args, bounded=True):
+        """
+        Exécute `fn(*args)` sur le pool sans bloquer la boucle asyncio.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, bounded=bounded))
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": max(0, self.in_flight - self.running),
+            "max_in_flight": self.max_in_flight,
+            "submitted": self.submitted,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+inference = InferenceExecutor()
+atexit.register(inference.shutdown)
+
+@app.exception_handler(ServerOverloaded)
+async def overloaded_handler(request, exc):
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+class PredictionBatcher():
     """
-    Endpoint pour la prédiction via API avec des données JSON
+    Regroupe les lignes soumises simultanément par plusieurs requêtes et les
+    prédit en un seul appel au modèle (une seule distribution joblib sur les
+    arbres au lieu d'une par requête avec le moteur sklearn).
+
+    Un lot part dès qu'il atteint `max_rows` lignes ou que la plus ancienne
+    ligne a attendu `max_wait_ms`. Les lots sont prédits l'un après l'autre :
+    pendant qu'un lot est en cours, les nouvelles requêtes s'accumulent, si bien
+    que la taille des lots s'adapte d'elle-même à la charge. Au-delà de
+    `max_pending` lignes en attente, les nouvelles lignes sont refusées
+    (ServerOverloaded).
     """
-    try:
-        # Convertir les données en dictionnaire puis DataFrame
-        data_dict = data.dict()
-        df = pd.DataFrame([data_dict])
-        
-        processed_data = preprocess_input(df)
-        prediction = model.predict(processed_data)
-        
+
+    def __init__(self, predict_fn, max_rows=BATCHER_MAX_ROWS, max_wait_ms=BATCHER_MAX_WAIT_MS,
+                 max_pending=BATCHER_MAX_PENDING, executor=None):
+        self.predict_fn = predict_fn
+        self.max_rows = max(1, int(max_rows))
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_pending = max(self.max_rows, int(max_pending))
+        self.executor = executor
+        self.n_rejected = 0
+        self.pending = []
+        self.worker = None
+        self.loop = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.n_batches = 0
+        self.n_rows = 0
+        self.max_batch_rows = 0
+        self.batch_sizes = {}
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.total_predict = 0.0
+
+    def stats(self):
+        """
+        Statistiques cumulées : taille des lots et temps d'attente en file.
+        """
         return {
-            "prediction": "Maladie rénale chronique" if prediction[0] == 1 else "Pas de maladie rénale chronique",
-            "code": "ckd" if prediction[0] == 1 else "notckd"
+            "max_rows": self.max_rows,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.n_batches,
+            "rows": self.n_rows,
+            "pending_rows": len(self.pending),
+            "max_pending_rows": self.max_pending,
+            "rejected_rows": self.n_rejected,
+            "mean_batch_rows": self.n_rows / self.n_batches if self.n_batches else 0.0,
+            "max_batch_rows": self.max_batch_rows,
+            "batch_rows_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            "mean_queue_wait_ms": 1000 * self.total_wait / self.n_rows if self.n_rows else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_wait_seen,
+            "mean_predict_ms": 1000 * self.total_predict / self.n_batches if self.n_batches else 0.0
         }
+
+    async def submit(self, row, timer=None):
+        """
+        Ajoute une ligne (matrice 1 x n_features) et attend son code prédit.
+        Avec `timer` (StageTimer), l'attente en file et la prédiction du lot sont
+        enregistrées comme étapes `queue` et `predict` de la requête.
+        """
+        loop = asyncio.get_running_loop()
+        if self.worker is None or self.worker.done() or self.loop is not loop:
+            self.loop = loop
+            self.has_pending = asyncio.Event()
+            self.is_full = asyncio.Event()
+            self.worker = loop.create_task(self._run())
+
+        if len(self.pending) >= self.max_pending:
+            self.n_rejected += 1
+            raise ServerOverloaded(f"Serveur surchargé : {len(self.pending)} lignes en attente de prédiction")
+
+        future = loop.create_future()
+        self.pending.append((row, future, time.perf_counter(), timer))
+        self.has_pending.set()
+        if len(self.pending) >= self.max_rows:
+            self.is_full.set()
+
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.has_pending.wait()
+
+            # Attendre un lot complet, au plus max_wait après l'arrivée de la plus ancienne ligne
+            if len(self.pending) < self.max_rows:
+                timeout = self.pending[0][2] + self.max_wait - time.perf_counter()
+                if timeout > 0:
+                    try:
+                        await asyncio.wait_for(self.is_full.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+
+            batch = self.pending[:self.max_rows]
+            self.pending = self.pending[self.max_rows:]
+            if not self.pending:
+                self.has_pending.clear()
+            if len(self.pending) < self.max_rows:
+                self.is_full.clear()
+
+            started = time.perf_counter()
+            try:
+                X = np.concatenate([row for row, _, _, _ in batch])
+                if self.executor is not None:
+                    predictions = await self.executor.run(self.predict_fn, X, bounded=False)
+                else:
+                    predictions = await loop.run_in_executor(None, self.predict_fn, X)
+            except Exception as e:
+                for _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._record(batch, started, time.perf_counter() - started)
+            for (_, future, _, _), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+
+    def _record(self, batch, started, predict_time):
+        size = len(batch)
+        self.n_batches += 1
+        self.n_rows += size
+        self.max_batch_rows = max(self.max_batch_rows, size)
+        self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+        self.total_predict += predict_time
+        for _, _, enqueued, timer in batch:
+            wait = started - enqueued
+            if timer is not None:
+                timer.observe("queue", wait)
+                timer.observe("predict", predict_time)
+            self.total_wait += wait
+            self.max_wait_seen = max(self.max_wait_seen, wait)
+
+
+
+class PredictionCache():
+    """
+    Cache LRU borné des prédictions, indexé par la ligne de caractéristiques
+    prétraitée (float32, -0.0 ramené à 0.0) : deux envois du même patient
+    donnent la même clé quel que soit leur format d'origine.
+
+    Les entrées peuvent expirer (`ttl_s`) et tout le cache est vidé dès que le
+    fichier du modèle change (date de modification ou taille).
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl_s=CACHE_TTL_S, model_path=MODEL_PATH, check_interval_s=1.0):
+        self.max_size = max(0, int(max_size))
+        self.ttl = ttl_s if ttl_s and ttl_s > 0 else None
+        self.model_path = model_path
+        self.check_interval = check_interval_s
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.model_signature = self._model_signature()
+        self.last_check = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(row):
+        row = np.ascontiguousarray(row, dtype=np.float32) + np.float32(0.0)
+        return row.tobytes()
+
+    def _model_signature(self):
+        try:
+            stat = os.stat(self.model_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _check_model(self, now):
+        # Un os.stat au plus toutes les check_interval secondes
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+        signature = self._model_signature()
+        if signature != self.model_signature:
+            self.model_signature = signature
+            self.entries.clear()
+            self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def get(self, key):
+        if not self.max_size:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            self._check_model(now)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            prediction, stored = entry
+            if self.ttl is not None and now - stored > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return prediction
+
+    def put(self, key, prediction):
+        if not self.max_size:
+            return
+        with self.lock:
+            self.entries[key] = (prediction, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "max_size": self.max_size,
+            "ttl_s": self.ttl,
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
+# En-tête permettant de choisir la version du modèle (sinon la version servie)
+MODEL_VERSION_HEADER = "X-Model-Version"
+
+def get_bundle(version=None):
+    """
+    Version du modèle qui traitera la requête, résolue une seule fois par requête.
+    """
+    try:
+        return registry.get(version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+async def get_bundle_async(version=None):
+    # Une version demandée mais pas encore chargée est chargée hors de la boucle asyncio
+    if version is None or version in registry.loaded:
+        return get_bundle(version)
+    return await run_in_threadpool(get_bundle, version)
+
+async def predict_with(bundle, data, request, timer):
+    try:
+        processed_data = bundle.vectorizer.transform(data)
+        timer.lap("preprocess")
+        key = bundle.cache.key(processed_data[0])
+        prediction = bundle.cache.get(key)
+        timer.lap("cache")
+        if prediction is None:
+            # Attente et calcul du lot sont enregistrés par le micro-batcher (queue / predict)
+            prediction = await bundle.batcher.submit(processed_data, timer)
+            timer.restart()
+            bundle.cache.put(key, prediction)
+
+        result = bundle.format_prediction(prediction)
+    except ServerOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+    response = encoder.response(result, request, headers={MODEL_VERSION_HEADER: bundle.version})
+    timer.lap("serialize")
+    return response
+
+@app.post("/predict")
+async def predict(data: PatientData, request: Request, x_model_version: Optional[str] = Header(None)):
+    """
+    Endpoint pour la prédiction via API avec des données JSON (ou msgpack)
+    """
+    timer = request_metrics.timer(request)
+    return await predict_with(await get_bundle_async(x_model_version), data, request, timer)
+
+@app.post("/models/{version}/predict")
+async def predict_version(version: str, data: PatientData, request: Request):
+    """
+    Prédiction avec une version donnée du modèle (comme /predict avec l'en-tête X-Model-Version).
+    """
+    timer = request_metrics.timer(request)
+    return await predict_with(await get_bundle_async(version), data, request, timer)
     
+@app.post("/predict/batch")
+async def predict_batch(request: Request, patients: List[Any] = Body(...), x_model_version: Optional[str] = Header(None)):
+    """
+    Endpoint pour la prédiction d'une liste de patients en un seul appel au modèle.
+    Chaque patient est validé séparément : un patient invalide reçoit ses erreurs
+    sans faire échouer le reste du lot. Les résultats suivent l'ordre d'entrée.
+    """
+    timer = request_metrics.timer(request)
+    if len(patients) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop volumineux : {len(patients)} patients (maximum {MAX_BATCH_SIZE})"
+        )
+
+    bundle = await get_bundle_async(x_model_version)
+
+    # Validation et prédiction sur le pool des calculs du modèle
+    result = await inference.run(score_batch, bundle, patients, timer)
+    timer.restart()
+    response = encoder.response(result, request, headers={MODEL_VERSION_HEADER: bundle.version})
+    timer.lap("serialize")
+    return response
+
+def score_batch(bundle, patients, timer):
+    timer.lap("queue")
+    results = [None] * len(patients)
+    valid_indices = []
+    valid_patients = []
+    for i, item in enumerate(patients):
+        try:
+            if not isinstance(item, dict):
+                raise TypeError("un objet JSON est attendu pour chaque patient")
+            valid_patients.append(PatientData(**item))
+            valid_indices.append(i)
+        except ValidationError as e:
+            results[i] = {"id": i, "error": [
+                {"field": ".".join(str(loc) for loc in err["loc"]), "message": err["msg"]} for err in e.errors()
+            ]}
+        except TypeError as e:
+            results[i] = {"id": i, "error": [{"field": None, "message": str(e)}]}
+    timer.lap("validate")
+
+    if valid_patients:
+        # Une seule matrice et un seul appel au modèle pour tout le lot
+        processed_data = bundle.vectorizer.transform_many(valid_patients)
+        timer.lap("preprocess")
+        codes = bundle.pipeline.decode_target(bundle.cached_predict(processed_data))
+        timer.lap("predict")
+        for i, code in zip(valid_indices, codes.tolist()):
+            results[i] = {"id": i, "prediction": LABELS[code], "code": code}
+
+    return {"results": results, "total_records": len(results), "total_errors": len(results) - len(valid_indices)}
+
+@app.get("/predict/batcher-stats")
+def batcher_stats(x_model_version: Optional[str] = Header(None)):
+    """
+    Statistiques du micro-batching de /predict (taille des lots, attente en file).
+    """
+    return get_bundle(x_model_version).batcher.stats()
+
+@app.get("/predict/executor-stats")
+def executor_stats():
+    """
+    Occupation du pool des calculs du modèle (en cours, en attente, requêtes refusées).
+    """
+    return inference.stats()
+
+@app.get("/predict/cache-stats")
+def cache_stats(x_model_version: Optional[str] = Header(None)):
+    """
+    Compteurs du cache des prédictions (succès, échecs, évictions, invalidations).
+    """
+    return get_bundle(x_model_version).cache.stats()
+
+@app.get("/models")
+def list_models():
+    """
+    Version servie, versions chargées en mémoire et versions disponibles dans le registre.
+    """
+    return registry.status()
+
+def check_admin_token(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+
+@app.post("/models/reload")
+def reload_models(x_admin_token: Optional[str] = Header(None)):
+    """
+    Vérifie tout de suite le registre (sans attendre la surveillance) et bascule si besoin.
+    """
+    check_admin_token(x_admin_token)
+    return check_registry()
+
+def check_registry():
+    try:
+        reloaded = registry.check()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Échec du chargement : {e}")
+    return dict(registry.status(), reloaded=reloaded)
+
+@app.post("/models/{version}/activate")
+def activate_model(version: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Fait de `version` la version servie par tous les workers (pointeur CURRENT du registre).
+    """
+    check_admin_token(x_admin_token)
+    try:
+        set_current(registry.registry_dir, version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return check_registry()
+
+@app.get("/metrics")
+def export_metrics():
+    """
+    Métriques au format texte de Prometheus : histogrammes de latence par endpoint
+    et par étape, requêtes en cours, débit des imports CSV, version du modèle.
+    """
+    return PlainTextResponse(metrics.render(), media_type=MetricsRegistry.CONTENT_TYPE)
+
+@app.get("/ready")
+def ready():
+    """
+    Prêt dès que le module est chargé (modèle, prétraitement et préchauffage) ;
+    retourne la durée de chaque phase du démarrage.
+    """
+    return {
+        "status": "ready", "engine": INFERENCE_ENGINE, "model_version": registry.current.version,
+        "boot_timings_s": BOOT_TIMINGS
+    }
+
 # Interface Web avec CSS amélioré
 @app.get("/", response_class=HTMLResponse)
 def home():
@@ -396,67 +962,491 @@ def home():
     """
 
 @app.post("/predict-form")
-def predict_form(
-    age: float = Form(...), bp: float = Form(...), sg: float = Form(...), al: float = Form(...),
+async def predict_form(
+    request: Request, age: float = Form(...), bp: float = Form(...), sg: float = Form(...), al: float = Form(...),
     su: float = Form(...), rbc: str = Form(...), pc: str = Form(...), pcc: str = Form(...), ba: str = Form(...),
     bgr: float = Form(...), bu: float = Form(...), sc: float = Form(...), sod: float = Form(...),
     pot: float = Form(...), hemo: float = Form(...), pcv: float = Form(...), wc: float = Form(...), rc: float = Form(...),
     htn: str = Form(...), dm: str = Form(...), cad: str = Form(...), appet: str = Form(...),
-    pe: str = Form(...), ane: str = Form(...)
+    pe: str = Form(...), ane: str = Form(...), x_model_version: Optional[str] = Header(None)
 ):
-    # Création d'un DataFrame avec les données du formulaire
-    data = pd.DataFrame({
-        "age": [age], "bp": [bp], "sg": [sg], "al": [al], "su": [su], 
-        "rbc": [rbc], "pc": [pc], "pcc": [pcc], "ba": [ba], "bgr": [bgr], 
-        "bu": [bu], "sc": [sc], "sod": [sod], "pot": [pot], "hemo": [hemo], 
-        "pcv": [pcv], "wc": [wc], "rc": [rc], "htn": [htn], "dm": [dm], 
-        "cad": [cad], "appet": [appet], "pe": [pe], "ane": [ane]
-    })
-    
-    processed_data = preprocess_input(data)
-    prediction = model.predict(processed_data)
-    
-    return {
-        "prediction": "Maladie rénale chronique" if prediction[0] == 1 else "Pas de maladie rénale chronique",
-        "code": "ckd" if prediction[0] == 1 else "notckd"
-    }
+    # Données du formulaire, validées comme pour /predict
+    data = PatientData(
+        age=age, bp=bp, sg=sg, al=al, su=su, rbc=rbc, pc=pc, pcc=pcc, ba=ba, bgr=bgr,
+        bu=bu, sc=sc, sod=sod, pot=pot, hemo=hemo, pcv=pcv, wc=wc, rc=rc, htn=htn, dm=dm,
+        cad=cad, appet=appet, pe=pe, ane=ane
+    )
+    timer = request_metrics.timer(request)
+
+    # Même chemin que /predict : cache, puis micro-batcher sur le pool des calculs
+    return await predict_with(await get_bundle_async(x_model_version), data, request, timer)
+
+class ResultSerializer():
+    """
+    Sérialisation en colonnes des résultats : les codes prédits indexent des
+    tableaux de libellés et de fragments de texte précalculés, sans créer un
+    dict Python par ligne.
+    """
+
+    def __init__(self, target_classes):
+        self.codes = np.array(list(target_classes), dtype=object)
+        self.labels = np.array([LABELS[code] for code in self.codes], dtype=object)
+        self.prefixes = {"json": '{"id": ', "ndjson": '{"id": ', "csv": ""}
+        self.suffixes = {
+            "json": np.array([
+                f', "prediction": {json.dumps(label, ensure_ascii=False)}, "code": "{code}"}},'
+                for code, label in zip(self.codes, self.labels)
+            ], dtype=object),
+            "ndjson": np.array([
+                f', "prediction": {json.dumps(label, ensure_ascii=False)}, "code": "{code}"}}\n'
+                for code, label in zip(self.codes, self.labels)
+            ], dtype=object),
+            "csv": np.array([f",{label},{code}\n" for code, label in zip(self.codes, self.labels)], dtype=object)
+        }
+
+    def rows(self, predictions, offset=0, output="ndjson"):
+        """
+        Lignes de résultats au format `output` ("json", "ndjson" ou "csv"), ids à partir de `offset`.
+        """
+        ids = np.arange(offset, offset + len(predictions)).astype(str).astype(object)
+        return "".join((self.prefixes[output] + ids + self.suffixes[output][predictions]).tolist())
+
+    def json_document(self, predictions):
+        """
+        Document {"results": [...], "total_records": n} identique à l'ancienne réponse.
+        """
+        rows = self.rows(predictions, output="json")[:-1]
+        return f'{{"results": [{rows}], "total_records": {len(predictions)}}}'
+
+    def records(self, predictions):
+        """
+        Même contenu que `json_document`, en objets Python (pour msgpack).
+        """
+        ids = range(len(predictions))
+        labels = self.labels[predictions].tolist()
+        codes = self.codes[predictions].tolist()
+        return {
+            "results": [{"id": i, "prediction": label, "code": code} for i, label, code in zip(ids, labels, codes)],
+            "total_records": len(predictions)
+        }
+
+    def columns(self, predictions):
+        """
+        Réponse compacte en colonnes : {"id": [...], "code": [...]}.
+        """
+        return {
+            "id": np.arange(len(predictions)).tolist(),
+            "code": self.codes[predictions].tolist(),
+            "total_records": len(predictions)
+        }
+
+
+def score_next_chunk(bundle, chunks, offset, output):
+    """
+    Lit, prétraite et prédit le bloc suivant ; retourne ses lignes de résultats
+    et son nombre de lignes, ou None à la fin du fichier.
+    """
+    chunk = next(chunks, None)
+    if chunk is None:
+        return None
+    predictions = bundle.predictor.predict(bundle.pipeline.transform(chunk))
+    return bundle.serializer.rows(predictions, offset, output), len(chunk)
+
+async def stream_predictions(bundle, chunks, output, timer):
+    """
+    Prétraite et prédit le CSV bloc par bloc et produit les résultats au fil de
+    l'eau (NDJSON ou CSV) : seul le bloc courant est gardé en mémoire. Chaque
+    bloc est calculé sur le pool des calculs du modèle, hors de la boucle asyncio.
+    """
+    if output == "csv":
+        yield "id,prediction,code\n"
+
+    started = time.perf_counter()
+    offset = 0
+    try:
+        while True:
+            # La requête a déjà été admise : ses blocs suivants ne sont pas refusés
+            chunk_started = time.perf_counter()
+            scored = await inference.run(score_next_chunk, bundle, chunks, offset, output, bounded=False)
+            if scored is None:
+                break
+            rows, n_rows = scored
+            timer.observe("score_chunk", time.perf_counter() - chunk_started)
+            yield rows
+            offset += n_rows
+        record_csv_rows("stream", offset, time.perf_counter() - started)
+    except Exception as e:
+        # Le statut HTTP est déjà parti : l'erreur est signalée dans le flux
+        if output == "csv":
+            yield f"error,{json.dumps(str(e), ensure_ascii=False)},\n"
+        else:
+            yield json.dumps({"error": str(e), "id": offset}, ensure_ascii=False) + "\n"
+
 
 @app.post("/upload-csv")
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(
+    request: Request, file: UploadFile = File(...), stream: bool = False, output: str = "ndjson", compact: bool = False,
+    x_model_version: Optional[str] = Header(None)
+):
+    """
+    Prédictions pour un fichier CSV. Avec `stream=true`, le fichier est lu par
+    blocs de CSV_CHUNK_ROWS lignes et les résultats sont renvoyés au fil de
+    l'eau, en NDJSON (`output=ndjson`) ou en CSV (`output=csv`).
+    Avec `compact=true`, la réponse est en colonnes : {"id": [...], "code": [...]}.
+    """
+    timer = request_metrics.timer(request)
+    bundle = await get_bundle_async(x_model_version)
+    headers = {MODEL_VERSION_HEADER: bundle.version}
+    if stream:
+        return await upload_csv_stream(bundle, file, output, headers, timer)
+
     try:
-        # Lire le contenu du fichier CSV
-        contents = await file.read()
-        df = pd.read_csv(file.file)
-        
-        # Vérifier que toutes les colonnes nécessaires sont présentes
-        missing_columns = [col for col in INPUT_COLUMNS if col not in df.columns]
-        if missing_columns:
-            return {"error": f"Colonnes manquantes dans le CSV: {', '.join(missing_columns)}"}
-        
-        # Prétraiter les données
-        processed_data = preprocess_input(df)
-        
-        # Faire des prédictions
-        predictions = model.predict(processed_data)
-        
-        # Ajouter les prédictions au DataFrame
-        df['prediction'] = ["ckd" if pred == 1 else "notckd" for pred in predictions]
-        
-        # Convertir le DataFrame en dictionnaire pour la réponse
-        results = []
-        for i, row in df.iterrows():
-            result = {
-                "id": i,
-                "prediction": "Maladie rénale chronique" if row['prediction'] == "ckd" else "Pas de maladie rénale chronique",
-                "code": row['prediction']
-            }
-            results.append(result)
+        # Lire le fichier CSV par blocs (directement depuis le fichier temporaire) ;
+        # refusé tout de suite (503) si le pool des calculs est saturé
+        started = time.perf_counter()
+        chunks = await inference.run(read_csv_chunks, file.file, PARALLEL_SHARD_ROWS)
+        timer.lap("read_csv")
+
+        # Prétraiter et prédire, sur plusieurs processus au-delà de PARALLEL_MIN_ROWS lignes
+        # (les blocs suivants du fichier sont lus pendant cette étape)
+        predictions = await inference.run(bundle.scorer.score, chunks, bounded=False)
+        timer.lap("score")
         
-        return {"results": results, "total_records": len(results)}
+        # Sérialiser directement depuis le tableau des prédictions
+        if compact:
+            response = encoder.response(bundle.serializer.columns(predictions), request, headers=headers)
+        elif encoder.wants_msgpack(request):
+            response = encoder.response(bundle.serializer.records(predictions), request, headers=headers)
+        else:
+            response = Response(content=bundle.serializer.json_document(predictions), media_type="application/json", headers=headers)
+        timer.lap("serialize")
+        record_csv_rows("batch", len(predictions), time.perf_counter() - started)
+        return response
     
+    except ServerOverloaded:
+        raise
+    except Exception as e:
+        return {"error": str(e)}
+
+def record_csv_rows(mode, n_rows, elapsed):
+    csv_rows.inc(mode, amount=n_rows)
+    if elapsed > 0:
+        csv_throughput.observe(n_rows / elapsed, mode)
+
+def read_csv_chunks(file, chunk_rows):
+    """
+    Lecteur du CSV par blocs de `chunk_rows` lignes, limité aux colonnes utiles.
+    Le premier bloc est lu tout de suite pour vérifier les colonnes.
+    """
+    import pandas as pd
+
+    reader = pd.read_csv(file, chunksize=chunk_rows, usecols=lambda col: col in INPUT_COLUMNS)
+    first_chunk = next(reader, None)
+    if first_chunk is None:
+        raise ValueError("Le fichier CSV ne contient aucune ligne")
+
+    # Vérifier que toutes les colonnes nécessaires sont présentes
+    missing_columns = [col for col in INPUT_COLUMNS if col not in first_chunk.columns]
+    if missing_columns:
+        raise ValueError(f"Colonnes manquantes dans le CSV: {', '.join(missing_columns)}")
+
+    return itertools.chain([first_chunk], reader)
+
+async def upload_csv_stream(bundle, file, output, headers, timer):
+    if output not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Format de sortie inconnu : utiliser 'ndjson' ou 'csv'")
+
+    try:
+        # Seules les colonnes utiles sont chargées, bloc par bloc
+        chunks = await inference.run(read_csv_chunks, file.file, CSV_CHUNK_ROWS)
+        timer.lap("read_csv")
+    except ServerOverloaded:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
+    media_type = "text/csv" if output == "csv" else "application/x-ndjson"
+    return StreamingResponse(stream_predictions(bundle, chunks, output, timer), media_type=media_type, headers=headers)
+
+def score_next_batch(bundle, batches, writer, offset):
+    """
+    Lit le RecordBatch suivant, le prédit et l'écrit ; retourne les octets
+    produits et son nombre de lignes, ou None à la fin du fichier.
+    """
+    batch = next(batches, None)
+    if batch is None:
+        return None
+    columns = batch_columns(batch, bundle.pipeline.feature_columns)
+    predictions = bundle.predictor.predict(bundle.pipeline.transform_columns(columns))
+    return writer.write(predictions, offset), batch.num_rows
+
+async def stream_columnar_predictions(bundle, batches, writer, first, timer):
+    """
+    Prédictions d'un fichier Parquet / Arrow lot par lot, renvoyées au fil de
+    l'eau dans le même format en colonnes, à la suite du premier lot (`first`)
+    déjà prédit. Si un lot suivant échoue, une ligne d'erreur (colonne `error`)
+    termine le fichier.
+    """
+    started = time.perf_counter()
+    data, offset = first
+    if data:
+        yield data
+    try:
+        while True:
+            batch_started = time.perf_counter()
+            scored = await inference.run(score_next_batch, bundle, batches, writer, offset, bounded=False)
+            if scored is None:
+                break
+            data, n_rows = scored
+            timer.observe("score_chunk", time.perf_counter() - batch_started)
+            if data:
+                yield data
+            offset += n_rows
+    except Exception as e:
+        # Le statut HTTP est déjà parti : l'erreur est signalée dans le fichier
+        yield writer.write_error(str(e), offset)
+    yield writer.close()
+    record_csv_rows("columnar", offset, time.perf_counter() - started)
+
+@app.post("/upload-columnar")
+async def upload_columnar(request: Request, file: UploadFile = File(...), x_model_version: Optional[str] = Header(None)):
+    """
+    Prédictions pour un fichier Parquet ou Arrow IPC (flux ou fichier) ayant les
+    colonnes INPUT_COLUMNS, lu par lots de COLUMNAR_BATCH_ROWS lignes sans
+    conversion en texte. La réponse est au même format (Parquet, sinon flux
+    Arrow IPC), avec les colonnes id, code, prediction et error.
+    """
+    if not pyarrow_available():
+        raise HTTPException(status_code=501, detail="pyarrow n'est pas installé : imports Parquet / Arrow indisponibles")
+
+    timer = request_metrics.timer(request)
+    bundle = await get_bundle_async(x_model_version)
+    try:
+        # Schéma vérifié et premier lot prédit avant d'envoyer la réponse : un fichier
+        # illisible reçoit un 400 ; refusé tout de suite (503) si le pool est saturé
+        fmt, batches = await inference.run(open_record_batches, file.file, COLUMNAR_BATCH_ROWS)
+        timer.lap("read_schema")
+        writer = PredictionWriter(fmt, bundle.pipeline.target_classes, LABELS)
+        scored = await inference.run(score_next_batch, bundle, batches, writer, 0, bounded=False)
+        timer.lap("score_first")
+    except ServerOverloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Fichier Parquet / Arrow illisible : {e}")
+
+    writer_format = "parquet" if fmt == "parquet" else "arrow"
+    headers = {
+        MODEL_VERSION_HEADER: bundle.version,
+        "Content-Disposition": f'attachment; filename="predictions.{writer_format}"'
+    }
+    return StreamingResponse(
+        stream_columnar_predictions(bundle, batches, writer, scored or (b"", 0), timer),
+        media_type=MEDIA_TYPES[writer_format], headers=headers
+    )
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...), output: str = "ndjson", x_model_version: Optional[str] = Header(None)):
+    """
+    Soumet un gros fichier CSV au scoring en arrière-plan et retourne tout de
+    suite l'id du travail. Le travail garde la version du modèle demandée (ou
+    servie au moment de l'envoi), même s'il reprend après un redémarrage.
+    """
+    bundle = await get_bundle_async(x_model_version)
+    try:
+        job = await run_in_threadpool(jobs.create, file.file, file.filename, output, bundle.version, JOB_CHUNK_ROWS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job_runner.start()
+    return job
+
+@app.get("/jobs")
+def list_jobs(limit: int = 50):
+    """
+    Derniers travaux de scoring, du plus récent au plus ancien.
+    """
+    return jobs.list(limit)
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """
+    État d'un travail : statut, lignes prédites, blocs terminés et progression (0 à 1).
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Travail inconnu : {job_id}")
+    return job
+
+@app.get("/jobs/{job_id}/results")
+def job_results(job_id: str):
+    """
+    Résultats d'un travail terminé (NDJSON ou CSV), lus bloc par bloc depuis le disque.
+    """
+    job = job_status(job_id)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Travail non terminé (statut : {job['status']})")
+
+    content = jobs.iter_results(job_id)
+    if job["output"] == "csv":
+        content = itertools.chain([b"id,prediction,code\n"], content)
+    media_type = "text/csv" if job["output"] == "csv" else "application/x-ndjson"
+    extension = "csv" if job["output"] == "csv" else "ndjson"
+    headers = {
+        MODEL_VERSION_HEADER: job["model_version"],
+        "Content-Disposition": f'attachment; filename="predictions_{job_id}.{extension}"'
+    }
+    return StreamingResponse(content, media_type=media_type, headers=headers)
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """
+    Annule un travail (en file ou en cours) et supprime ses fichiers.
+    """
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Travail inconnu : {job_id}")
+    return job
+
+def score_job_chunk(version, chunk, first_id, output):
+    bundle = registry.get(version)
+    predictions = bundle.predictor.predict(bundle.pipeline.transform(chunk))
+    return bundle.serializer.rows(predictions, first_id, output)
+
+class ModelBundle():
+    """
+    Une version du modèle prête à servir : prédicteur, prétraitement, et son
+    propre micro-batcher, cache et pool de scoring. Une requête garde la même
+    version du début à la fin, même si une autre est activée entre-temps.
+    """
+
+    def __init__(self, version, model_path, pipeline_path, engine=INFERENCE_ENGINE):
+        self.version = version
+        self.model_path = model_path
+        self.load_timings = {}
+
+        phase_started = time.perf_counter()
+        self.predictor, self.predictor_path = load_predictor(model_path, engine)
+        self.load_timings["model"] = time.perf_counter() - phase_started
+
+        # Prétraitement ajusté lors de l'entraînement de cette version, et chemin
+        # rapide PatientData -> ligne NumPy (le Random Forest prédit en float32)
+        phase_started = time.perf_counter()
+        self.pipeline = KidneyPreprocessingPipeline.load(pipeline_path)
+        self.vectorizer = PatientVectorizer(self.pipeline, dtype=np.float32)
+        self.load_timings["pipeline"] = time.perf_counter() - phase_started
+
+        self.serializer = ResultSerializer(self.pipeline.target_classes)
+        self.batcher = PredictionBatcher(self.predictor.predict, executor=inference)
+        self.cache = PredictionCache(model_path=model_path)
+        self.scorer = ParallelScorer(
+            self.predictor, self.pipeline, pipeline_path, n_workers=PARALLEL_WORKERS, min_rows=PARALLEL_MIN_ROWS,
+            predictor_path=self.predictor_path, engine=engine
+        )
+
+        phase_started = time.perf_counter()
+        self.warm_up()
+        self.load_timings["warm_up"] = time.perf_counter() - phase_started
+
+    def warm_up(self):
+        """
+        Une prédiction factice (patient aux valeurs les plus fréquentes) avant de
+        servir : premiers accès aux pages du modèle, compilation numba.
+        """
+        dummy = SimpleNamespace(**self.pipeline.modes)
+        return self.predictor.predict(self.vectorizer.transform(dummy))
+
+    def format_prediction(self, prediction):
+        """
+        Réponse pour un code prédit par le modèle (0 = ckd, 1 = notckd).
+        """
+        code = str(self.pipeline.decode_target([prediction])[0])
+        return {"prediction": LABELS[code], "code": code}
+
+    def cached_predict(self, X):
+        """
+        Prédit une matrice en ne passant au modèle que les lignes absentes du cache.
+        """
+        keys = [self.cache.key(row) for row in X]
+        predictions = [self.cache.get(key) for key in keys]
+        missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if missing:
+            for i, prediction in zip(missing, self.predictor.predict(X[missing])):
+                predictions[i] = prediction
+                self.cache.put(keys[i], prediction)
+        return np.asarray(predictions)
+
+    def close(self):
+        self.scorer.shutdown()
+
+
+SERVICE_METRICS_REGISTERED = False
+
+def register_service_metrics():
+    """
+    Métriques lues dans la version servie, le pool de calcul et la file des
+    travaux ; enregistrées une seule fois par processus, au premier démarrage.
+    """
+    global SERVICE_METRICS_REGISTERED
+    if SERVICE_METRICS_REGISTERED:
+        return
+    SERVICE_METRICS_REGISTERED = True
+    metrics.callback(
+        "kidney_model_info", "Version du modèle servie et moteur d'inférence",
+        lambda: [({"version": registry.current.version, "engine": INFERENCE_ENGINE}, 1)]
+    )
+    metrics.callback("kidney_models_loaded", "Versions du modèle chargées en mémoire", lambda: [({}, len(registry.loaded))])
+    metrics.callback("kidney_model_reloads_total", "Bascules de version du modèle", lambda: [({}, registry.n_reloads)], "counter")
+    metrics.callback(
+        "kidney_inference_tasks", "Calculs du modèle en cours ou en attente",
+        lambda: [({"state": "running"}, inference.running), ({"state": "queued"}, max(0, inference.in_flight - inference.running))]
+    )
+    metrics.callback(
+        "kidney_inference_rejected_total", "Calculs refusés (pool saturé)", lambda: [({}, inference.rejected)], "counter"
+    )
+    metrics.callback(
+        "kidney_batcher_pending_rows", "Lignes en attente dans le micro-batcher de /predict",
+        lambda: [({}, len(registry.current.batcher.pending))]
+    )
+    metrics.callback(
+        "kidney_scoring_jobs", "Travaux de scoring par statut",
+        lambda: [({"status": status}, n) for status, n in sorted(jobs.counts().items())]
+    )
+
+
+def start_services():
+    """
+    Charge la version servie (modèle, prétraitement, préchauffage), surveille
+    le registre et démarre les threads de la file des travaux de scoring.
+    Appelé au démarrage du serveur (lifespan) et non à l'import : les processus
+    de scoring (spawn) réimportent ce module sans rien charger ni démarrer.
+    """
+    global registry, jobs, job_runner
+
+    registry = ModelRegistry(
+        ModelBundle, registry_dir=REGISTRY_DIR, default_model_path=MODEL_PATH, default_pipeline_path=PIPELINE_FILENAME,
+        poll_interval_s=REGISTRY_POLL_S, max_loaded=REGISTRY_MAX_LOADED
+    )
+    BOOT_TIMINGS.update(registry.start().load_timings)
+    BOOT_TIMINGS["total"] = time.perf_counter() - BOOT_STARTED
+    print(
+        f"⏱️ Démarrage ({INFERENCE_ENGINE}, version {registry.current.version}) : "
+        + " | ".join(f"{phase} {t:.3f} s" for phase, t in BOOT_TIMINGS.items())
+    )
+
+    # File des travaux de scoring : les travaux interrompus par un arrêt ou un plantage reprennent à leur dernier bloc
+    jobs = JobStore(JOBS_DIR)
+    job_runner = JobRunner(jobs, score_job_chunk, n_workers=JOB_WORKERS, lease_s=JOB_LEASE_S)
+    job_runner.start()
+
+    register_service_metrics()
+
+
+def stop_services():
+    job_runner.stop()
+    registry.close()
+
+
 # Point d'entrée pour l'exécution du serveur
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,247 @@
+import threading
+import time
+from bisect import bisect_left
+
+
+# Bornes (en secondes) des histogrammes de latence : de 50 µs à 10 s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Bornes du débit des imports CSV, en lignes par seconde
+THROUGHPUT_BUCKETS = (1e2, 1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter():
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.type = "counter"
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for labelvalues, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class Gauge(Counter):
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.type = "gauge"
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class CallbackMetric():
+    """
+    Métrique lue au moment de l'export : `callback()` retourne des couples (dict des labels, valeur).
+    """
+
+    def __init__(self, name, documentation, callback, type="gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.type = type
+
+    def samples(self):
+        for labels, value in self.callback():
+            yield self.name, _format_labels(list(labels), list(labels.values())), value
+
+
+class Histogram():
+    """
+    Histogramme à bornes fixes : une observation coûte une recherche
+    dichotomique et trois incréments sous verrou.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.type = "histogram"
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labelvalues)
+            if series is None:
+                series = self.series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self.lock:
+            series = {labelvalues: (list(counts), total, n) for labelvalues, (counts, total, n) in self.series.items()}
+        for labelvalues, (counts, total, n) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield self.name + "_bucket", _format_labels(self.labelnames, labelvalues, le), cumulative
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, n
+
+
+class MetricsRegistry():
+    """
+    Ensemble des métriques exportées au format texte de Prometheus.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def callback(self, name, documentation, callback, type="gauge"):
+        return self.register(CallbackMetric(name, documentation, callback, type))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetrics():
+    """
+    Métriques par endpoint : durée totale, durée de chaque étape, nombre de
+    requêtes par statut et requêtes en cours.
+    """
+
+    def __init__(self, registry, prefix):
+        self.duration = registry.histogram(
+            f"{prefix}_request_duration_seconds", "Durée totale des requêtes", ["endpoint"]
+        )
+        self.stages = registry.histogram(
+            f"{prefix}_request_stage_seconds", "Durée de chaque étape du traitement des requêtes", ["endpoint", "stage"]
+        )
+        self.requests = registry.counter(f"{prefix}_requests_total", "Requêtes traitées", ["endpoint", "status"])
+        self.in_flight = registry.gauge(f"{prefix}_requests_in_flight", "Requêtes en cours", ["endpoint"])
+
+    def timer(self, request):
+        return StageTimer(self, request.scope.get("state", {}))
+
+
+class StageTimer():
+    """
+    Chronomètre des étapes d'une requête, créé au début du handler.
+
+    La première étape (`parse`) part de l'arrivée de la requête dans le
+    middleware : réception du corps et validation Pydantic. Les handlers
+    mesurent eux-mêmes la sérialisation de leur réponse (`serialize`).
+    """
+
+    __slots__ = ("metrics", "state", "endpoint", "last")
+
+    def __init__(self, metrics, state):
+        self.metrics = metrics
+        self.state = state
+        self.endpoint = state.get("metrics_endpoint")
+        self.last = time.perf_counter()
+        started = state.get("metrics_started")
+        if started is not None:
+            self.observe("parse", self.last - started)
+
+    def observe(self, stage, seconds):
+        if self.endpoint is not None:
+            self.metrics.stages.observe(seconds, self.endpoint, stage)
+
+    def lap(self, stage):
+        """
+        Enregistre le temps écoulé depuis l'étape précédente sous le nom `stage`.
+        """
+        now = time.perf_counter()
+        self.observe(stage, now - self.last)
+        self.last = now
+
+    def restart(self):
+        """
+        Repart de maintenant sans rien enregistrer : le temps écoulé depuis
+        l'étape précédente a déjà été mesuré autrement (`observe`).
+        """
+        self.last = time.perf_counter()
+
+
+class MetricsMiddleware():
+    """
+    Middleware ASGI (sans la surcouche de BaseHTTPMiddleware) qui mesure les
+    requêtes des endpoints reconnus par `endpoint_for(path)` ; les autres
+    chemins passent sans mesure, pour borner le nombre de séries.
+    """
+
+    def __init__(self, app, metrics, endpoint_for):
+        self.app = app
+        self.metrics = metrics
+        self.endpoint_for = endpoint_for
+
+    async def __call__(self, scope, receive, send):
+        endpoint = self.endpoint_for(scope["path"]) if scope["type"] == "http" else None
+        if endpoint is None:
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        state = scope.setdefault("state", {})
+        state["metrics_started"] = started
+        state["metrics_endpoint"] = endpoint
+        status = 500
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.in_flight.inc(endpoint)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            self.metrics.in_flight.dec(endpoint)
+            self.metrics.duration.observe(time.perf_counter() - started, endpoint)
+            self.metrics.requests.inc(endpoint, str(status))
@@ -0,0 +1,67 @@
+"""
+Benchmark des moteurs d'inférence de la forêt : sklearn, forêt compilée NumPy
+et noyau Numba. Vérifie d'abord que predict et predict_proba sont identiques
+à sklearn, puis mesure la latence par taille de lot.
+
+Usage (depuis la racine du projet) :
+    python benchmarks/bench_forest_inference.py --batch-sizes 1 64 10000
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+warnings.filterwarnings("ignore")
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from forest_inference import load_engine, numba_available
+from kidney_preprocessing import KidneyPreprocessingPipeline, PIPELINE_FILENAME
+
+
+def time_predict(predictor, X, min_time=0.5):
+    n_calls = 0
+    start = time.perf_counter()
+    while True:
+        predictor.predict(X)
+        n_calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return 1000 * elapsed / n_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64, 1000, 10000])
+    parser.add_argument("--model", default="best_model_Random_Forest.pkl")
+    parser.add_argument("--data", default="kidney_disease.csv")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    pipeline = KidneyPreprocessingPipeline.load(PIPELINE_FILENAME)
+
+    # Lignes réelles répétées jusqu'à la plus grande taille de lot
+    X_real = pipeline.transform(pd.read_csv(args.data))
+    n_max = max(args.batch_sizes)
+    X = np.resize(X_real, (max(n_max, len(X_real)), X_real.shape[1])).astype(np.float32)
+
+    engines = ["sklearn", "numpy"] + (["numba"] if numba_available() else [])
+    predictors = {engine: load_engine(model, engine) for engine in engines}
+
+    expected_proba = model.predict_proba(X)
+    expected = model.predict(X)
+    for engine, predictor in predictors.items():
+        same = np.array_equal(predictor.predict_proba(X), expected_proba) and np.array_equal(predictor.predict(X), expected)
+        print(f"{engine:<8} identique à sklearn : {'oui' if same else 'NON'}")
+
+    print(f"\n{'lot':>6} " + " ".join(f"{engine:>12}" for engine in engines) + "   (ms par appel)")
+    for n in args.batch_sizes:
+        timings = [time_predict(predictor, X[:n]) for predictor in predictors.values()]
+        print(f"{n:>6} " + " ".join(f"{t:12.3f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Test de charge HTTP de l'API : démarre api_kidney_disease sous uvicorn (ou
+cible une URL existante), envoie un mélange de requêtes /predict,
+/predict-form et /upload-csv construites à partir des lignes de
+kidney_disease.csv, à plusieurs niveaux de concurrence, puis rapporte les
+latences p50/p95/p99, le débit et la mémoire (RSS) du serveur.
+
+Les résultats sont sauvegardés en JSON (avec le commit courant) pour comparer
+deux versions : --compare ancien.json affiche les écarts.
+
+Usage (depuis la racine du projet) :
+    python benchmarks/bench_http_load.py --concurrency 1 8 32 --duration 10
+    python benchmarks/bench_http_load.py --mix predict=0.7,predict-form=0.2,upload-csv=0.1 \\
+        --env KIDNEY_INFERENCE_ENGINE=numpy --compare benchmarks/results/http_load_abc1234.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import warnings
+warnings.filterwarnings("ignore")
+
+import httpx
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from kidney_preprocessing import INPUT_COLUMNS, correct_incorrectly_encoded_columns
+
+ENDPOINTS = ("predict", "predict-form", "upload-csv")
+NUMERIC_COLUMNS = [
+    "age", "bp", "sg", "al", "su", "bgr", "bu", "sc", "sod", "pot", "hemo", "pcv", "wc", "rc"
+]
+
+
+def load_patients(path):
+    """
+    Lignes du jeu de données au format de PatientData : valeurs manquantes ou
+    mal codées remplacées par la valeur la plus fréquente de la colonne.
+    """
+    data = correct_incorrectly_encoded_columns(pd.read_csv(path))[INPUT_COLUMNS]
+    for col in INPUT_COLUMNS:
+        if col in NUMERIC_COLUMNS:
+            data[col] = pd.to_numeric(data[col], errors="coerce")
+        else:
+            data[col] = data[col].astype(object).where(data[col].notna(), None)
+            data[col] = data[col].map(lambda v: None if v is None else str(v).strip().replace("\t", ""))
+            data[col] = data[col].replace({"nan": None, "?": None, "": None})
+        data[col] = data[col].fillna(data[col].mode().iloc[0])
+    return data
+
+
+def make_csv(patients, n_rows, rng):
+    rows = patients.iloc[rng.integers(0, len(patients), n_rows)]
+    return rows.to_csv(index=False).encode()
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Endpoint inconnu dans --mix : {name} (choix : {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_tree_rss(pid):
+    """
+    Mémoire résidente (octets) du processus et de ses descendants, lue dans /proc
+    (None hors Linux).
+    """
+    total = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        return total or None
+    return total
+
+
+def start_server(port, env_overrides, workers):
+    env = dict(os.environ, **env_overrides)
+    command = [
+        sys.executable, "-m", "uvicorn", "api_kidney_disease:app",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"
+    ]
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def wait_ready(url, server, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError("Le serveur s'est arrêté au démarrage :\n" + server.stderr.read().decode())
+        try:
+            if httpx.get(url + "/ready", timeout=1).status_code == 200:
+                return time.monotonic()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"Serveur non prêt après {timeout} s")
+
+
+def summarize(latencies, n_errors, statuses, elapsed, n_rows=0):
+    latencies = np.asarray(latencies) * 1000
+    summary = {
+        "requests": int(latencies.size) + n_errors,
+        "errors": n_errors,
+        "statuses": dict(sorted(statuses.items())),
+        "throughput_rps": (latencies.size + n_errors) / elapsed if elapsed else 0.0
+    }
+    if latencies.size:
+        summary.update({
+            "mean_ms": float(latencies.mean()),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max())
+        })
+    if n_rows:
+        summary["rows"] = n_rows
+        summary["rows_per_s"] = n_rows / elapsed if elapsed else 0.0
+    return summary
+
+
+async def run_level(url, concurrency, duration, n_requests, mix, payloads, seed, server_pid):
+    """
+    `concurrency` clients en boucle fermée pendant `duration` secondes (ou jusqu'à
+    `n_requests` requêtes) ; chaque requête tire son endpoint selon `mix`.
+    """
+    names = list(mix)
+    weights = np.array([mix[name] for name in names]) / sum(mix.values())
+    results = {name: {"latencies": [], "errors": 0, "statuses": {}, "rows": 0} for name in names}
+    remaining = [n_requests] if n_requests else None
+    rss_samples = []
+
+    async def client(worker_id, http):
+        rng = np.random.default_rng(seed + worker_id)
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            name = names[rng.choice(len(names), p=weights)]
+            patient = payloads["patients"][rng.integers(len(payloads["patients"]))]
+            started = time.perf_counter()
+            try:
+                if name == "predict":
+                    response = await http.post("/predict", json=patient)
+                elif name == "predict-form":
+                    response = await http.post("/predict-form", data={k: str(v) for k, v in patient.items()})
+                else:
+                    response = await http.post("/upload-csv", files={"file": ("patients.csv", payloads["csv"], "text/csv")})
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+
+            result = results[name]
+            result["statuses"][status] = result["statuses"].get(status, 0) + 1
+            if status == "200":
+                result["latencies"].append(elapsed)
+                if name == "upload-csv":
+                    result["rows"] += payloads["csv_rows"]
+            else:
+                result["errors"] += 1
+
+    async def sample_rss():
+        while True:
+            rss = process_tree_rss(server_pid) if server_pid else None
+            if rss is not None:
+                rss_samples.append(rss)
+            await asyncio.sleep(0.2)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as http:
+        sampler = asyncio.create_task(sample_rss())
+        started = time.perf_counter()
+        await asyncio.gather(*(client(i, http) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+    all_latencies = [t for result in results.values() for t in result["latencies"]]
+    all_errors = sum(result["errors"] for result in results.values())
+    all_statuses = {}
+    for result in results.values():
+        for status, count in result["statuses"].items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "overall": summarize(all_latencies, all_errors, all_statuses, elapsed),
+        "endpoints": {
+            name: summarize(r["latencies"], r["errors"], r["statuses"], elapsed, r["rows"]) for name, r in results.items()
+        },
+        "rss_peak_bytes": max(rss_samples) if rss_samples else None,
+        "rss_end_bytes": rss_samples[-1] if rss_samples else None
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_level(level):
+    rss = level["rss_peak_bytes"]
+    print(f"\nConcurrence {level['concurrency']} — RSS max {rss / 2**20:.0f} Mo" if rss else f"\nConcurrence {level['concurrency']}")
+    print(f"{'endpoint':<14} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erreurs':>8}")
+    for name, summary in [("total", level["overall"])] + list(level["endpoints"].items()):
+        print(
+            f"{name:<14} {summary['throughput_rps']:9.1f} {summary.get('p50_ms', float('nan')):9.2f}"
+            f" {summary.get('p95_ms', float('nan')):9.2f} {summary.get('p99_ms', float('nan')):9.2f} {summary['errors']:8d}"
+        )
+
+
+def print_comparison(previous, current):
+    """
+    Écart relatif (en %) entre deux fichiers de résultats, par niveau de concurrence et endpoint.
+    """
+    print(f"\nComparaison avec {previous.get('commit')} (écart relatif, négatif = plus rapide / moins de débit)")
+    if previous.get("config") != current.get("config"):
+        print("⚠️ Configurations différentes (mélange, env, durée...) : comparaison à interpréter avec prudence")
+    print(f"{'conc.':>5} {'endpoint':<14} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    old_levels = {level["concurrency"]: level for level in previous["levels"]}
+    for level in current["levels"]:
+        old = old_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        pairs = [("total", level["overall"], old["overall"])]
+        pairs += [(name, s, old["endpoints"].get(name)) for name, s in level["endpoints"].items()]
+        for name, new, before in pairs:
+            if not before:
+                continue
+            deltas = []
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+                a, b = before.get(key), new.get(key)
+                deltas.append(f"{100 * (b - a) / a:+8.1f}%" if a and b is not None else f"{'-':>9}")
+            print(f"{level['concurrency']:>5} {name:<14} " + " ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="secondes par niveau de concurrence")
+    parser.add_argument("--requests", type=int, default=0, help="nombre de requêtes par niveau (0 = selon --duration)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("predict=0.8,predict-form=0.15,upload-csv=0.05"))
+    parser.add_argument("--csv-rows", type=int, default=400, help="lignes par fichier envoyé à /upload-csv")
+    parser.add_argument("--warmup", type=float, default=2.0, help="secondes de préchauffage avant les mesures")
+    parser.add_argument("--data", default=os.path.join(ROOT, "kidney_disease.csv"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="API déjà démarrée (sinon uvicorn est lancé localement)")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn")
+    parser.add_argument("--env", action="append", default=[], help="variable KEY=VALUE passée au serveur")
+    parser.add_argument("--output", help="fichier JSON des résultats (défaut : benchmarks/results/http_load_<commit>.json)")
+    parser.add_argument("--compare", help="fichier JSON d'une exécution précédente")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    patients = load_patients(args.data)
+    payloads = {
+        "patients": [
+            {col: (float(v) if col in NUMERIC_COLUMNS else v) for col, v in row.items()}
+            for row in patients.to_dict(orient="records")
+        ],
+        "csv": make_csv(patients, args.csv_rows, rng),
+        "csv_rows": args.csv_rows
+    }
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        launched = time.monotonic()
+        server = start_server(port, env_overrides, args.workers)
+    try:
+        ready_at = wait_ready(url, server)
+        startup_s = ready_at - launched if server is not None else None
+        server_pid = server.pid if server is not None else None
+        rss_idle = process_tree_rss(server_pid) if server_pid else None
+        if startup_s is not None:
+            print(f"Serveur prêt en {startup_s:.2f} s" + (f", RSS {rss_idle / 2**20:.0f} Mo" if rss_idle else ""))
+
+        if args.warmup > 0:
+            asyncio.run(run_level(url, 1, args.warmup, 0, args.mix, payloads, args.seed, None))
+
+        levels = []
+        for concurrency in args.concurrency:
+            level = asyncio.run(
+                run_level(url, concurrency, args.duration, args.requests, args.mix, payloads, args.seed, server_pid)
+            )
+            print_level(level)
+            levels.append(level)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "url": args.url, "workers": args.workers, "env": env_overrides, "mix": args.mix,
+            "csv_rows": args.csv_rows, "duration_s": args.duration, "requests": args.requests, "seed": args.seed
+        },
+        "startup_s": startup_s,
+        "rss_idle_bytes": rss_idle,
+        "levels": levels
+    }
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"http_load_{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nRésultats sauvegardés : {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark de la latence par requête /predict : prétraitement réajusté à chaque
+appel (ancienne version de l'API), pipeline ajusté à l'entraînement appliqué à
+un DataFrame, et vectoriseur sans pandas (PatientVectorizer).
+
+Usage (depuis la racine du projet) :
+    python benchmarks/bench_preprocessing.py --n-requests 500
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+import warnings
+warnings.filterwarnings("ignore")
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kidney_preprocessing import KidneyPreprocessingPipeline, PatientVectorizer, COLUMNS_TO_DROP, INPUT_COLUMNS, PIPELINE_FILENAME
+
+
+PAYLOAD = {
+    "age": 45, "bp": 80, "sg": 1.02, "al": 1, "su": 0,
+    "rbc": "normal", "pc": "abnormal", "pcc": "notpresent",
+    "ba": "notpresent", "bgr": 150, "bu": 35, "sc": 1.5,
+    "sod": 140, "pot": 4.5, "hemo": 12.5, "pcv": 40, "wc": 8000,
+    "rc": 4.5, "htn": "yes", "dm": "no", "cad": "no",
+    "appet": "good", "pe": "no", "ane": "no"
+}
+
+
+# Ancien prétraitement de l'API : imputer, LabelEncoder et scaler réajustés à chaque requête
+def legacy_preprocess_input(data):
+    for col in ['pcv', 'wc', 'rc', 'dm', 'cad']:
+        data[col] = data[col].astype(str).str.strip().str.replace("\t", "").replace("?", np.nan)
+    for col in ['pcv', 'wc', 'rc']:
+        data[col] = pd.to_numeric(data[col], errors='coerce')
+    for i in data.select_dtypes(exclude=['object']).columns:
+        data[i] = data[i].apply(lambda x: float(x))
+
+    mode = SimpleImputer(missing_values=np.nan, strategy="most_frequent")
+    df = pd.DataFrame(mode.fit_transform(data))
+    df.columns = data.columns
+    df = df.apply(LabelEncoder().fit_transform)
+    df.drop(columns=COLUMNS_TO_DROP, inplace=True)
+
+    return MinMaxScaler(feature_range=(-1, 1)).fit_transform(df)
+
+
+def time_requests(name, preprocess, model, n_requests, as_dataframe=True):
+    patient = SimpleNamespace(**PAYLOAD)
+    latencies = np.empty(n_requests)
+    for i in range(n_requests):
+        start = time.perf_counter()
+        if as_dataframe:
+            model.predict(preprocess(pd.DataFrame([PAYLOAD])[INPUT_COLUMNS]))
+        else:
+            model.predict(preprocess(patient))
+        latencies[i] = time.perf_counter() - start
+
+    latencies *= 1000
+    report(name, latencies)
+    return latencies
+
+
+def report(name, latencies):
+    print(
+        f"{name:<28} moyenne {latencies.mean():7.3f} ms | p50 {np.percentile(latencies, 50):7.3f} ms"
+        f" | p95 {np.percentile(latencies, 95):7.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-requests", type=int, default=300)
+    parser.add_argument("--model", default="best_model_Random_Forest.pkl")
+    parser.add_argument("--pipeline", default=PIPELINE_FILENAME)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    pipeline = KidneyPreprocessingPipeline.load(args.pipeline)
+    vectorizer = PatientVectorizer(pipeline, dtype=np.float32)
+
+    # Préchauffage
+    time_requests("préchauffage", pipeline.transform, model, 10)
+
+    before = time_requests("avant (réajustement)", legacy_preprocess_input, model, args.n_requests)
+    after = time_requests("après (pipeline sauvegardé)", pipeline.transform, model, args.n_requests)
+    fast = time_requests("vectoriseur sans pandas", vectorizer.transform, model, args.n_requests, as_dataframe=False)
+
+    before_pre = time_requests("avant, sans predict", legacy_preprocess_input, _NoModel(), args.n_requests)
+    after_pre = time_requests("après, sans predict", pipeline.transform, _NoModel(), args.n_requests)
+    fast_pre = time_requests("vectoriseur, sans predict", vectorizer.transform, _NoModel(), args.n_requests, as_dataframe=False)
+
+    print(f"\nGain par requête : {before.mean() - after.mean():.3f} ms (prétraitement seul : x{before_pre.mean() / after_pre.mean():.1f})")
+    print(f"Vectoriseur : {before.mean() - fast.mean():.3f} ms par requête (prétraitement seul : x{before_pre.mean() / fast_pre.mean():.0f})")
+
+
+class _NoModel():
+    def predict(self, X):
+        return X
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark du coût de sérialisation par ligne des réponses de prédiction :
+avant (jsonable_encoder + json, la JSONResponse par défaut de FastAPI) et
+après (ResponseEncoder : orjson, msgpack si installé), pour une prédiction
+seule et des lots de résultats de tailles croissantes.
+
+Usage (depuis la racine du projet) :
+    python benchmarks/bench_serialization.py --sizes 1 100 10000 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from response_encoding import dumps_json, dumps_msgpack, dumps_orjson, msgpack_available, orjson_available
+
+
+LABELS = {"ckd": "Maladie rénale chronique", "notckd": "Pas de maladie rénale chronique"}
+CODES = np.array(["ckd", "notckd"], dtype=object)
+
+
+def fastapi_default(content):
+    # Équivalent de JSONResponse(content) : conversion jsonable_encoder puis json.dumps
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def batch_document(predictions):
+    # Réponse de /predict/batch et de /upload-csv (format non compact)
+    records = [
+        {"id": i, "prediction": LABELS[code], "code": code}
+        for i, code in enumerate(CODES[predictions].tolist())
+    ]
+    return {"results": records, "total_records": len(records), "total_errors": 0}
+
+
+def time_encoder(encode, content, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = encode(content)
+        best = min(best, time.perf_counter() - start)
+    return best, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encoders = [("avant (FastAPI par défaut)", fastapi_default), ("json sans jsonable_encoder", dumps_json)]
+    if orjson_available():
+        encoders.append(("orjson", dumps_orjson))
+    else:
+        print("⚠️ orjson n'est pas installé")
+    if msgpack_available():
+        encoders.append(("msgpack", dumps_msgpack))
+    else:
+        print("⚠️ msgpack n'est pas installé")
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        predictions = rng.integers(0, len(CODES), size)
+        content = {"prediction": LABELS["ckd"], "code": "ckd"} if size == 1 else batch_document(predictions)
+        # Plus de répétitions pour les petits documents, où le bruit domine
+        repeat = args.repeat * max(1, 1000 // size)
+
+        print(f"\n{size} ligne(s)")
+        baseline = None
+        for name, encode in encoders:
+            seconds, n_bytes = time_encoder(encode, content, repeat)
+            baseline = baseline or seconds
+            print(
+                f"  {name:<28} {seconds * 1e6 / size:9.3f} µs/ligne | {seconds * 1000:9.3f} ms"
+                f" | {n_bytes / size:7.1f} octets/ligne | x{baseline / seconds:5.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
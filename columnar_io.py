@@ -0,0 +1,197 @@
+import importlib.util
+
+import numpy as np
+
+from kidney_preprocessing import INPUT_COLUMNS
+
+
+# pyarrow est une dépendance optionnelle, importée au premier fichier Parquet / Arrow
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+
+def pyarrow_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def detect_format(file):
+    """
+    'parquet', 'arrow-file' (format fichier IPC / Feather v2) ou 'arrow' (flux IPC),
+    d'après les premiers octets ; le fichier est repositionné au début.
+    """
+    head = file.read(len(ARROW_FILE_MAGIC))
+    file.seek(0)
+    if head.startswith(PARQUET_MAGIC):
+        return "parquet"
+    if head == ARROW_FILE_MAGIC:
+        return "arrow-file"
+    return "arrow"
+
+
+def _check_schema(schema, columns):
+    missing_columns = [col for col in columns if col not in schema.names]
+    if missing_columns:
+        raise ValueError(f"Colonnes manquantes dans le fichier : {', '.join(missing_columns)}")
+
+
+def open_record_batches(file, batch_rows, columns=INPUT_COLUMNS):
+    """
+    Format du fichier et itérateur de ses RecordBatch (au plus `batch_rows`
+    lignes pour Parquet), limités aux colonnes utiles. Le schéma est vérifié
+    avant toute lecture des données.
+    """
+    import pyarrow as pa
+
+    fmt = detect_format(file)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        # Les colonnes texte sont lues directement codées par dictionnaire
+        schema = pq.read_schema(file)
+        file.seek(0)
+        _check_schema(schema, columns)
+        strings = [col for col in columns if pa.types.is_string(schema.field(col).type)]
+        reader = pq.ParquetFile(file, read_dictionary=strings)
+        return fmt, reader.iter_batches(batch_size=batch_rows, columns=list(columns))
+
+    if fmt == "arrow-file":
+        reader = pa.ipc.open_file(file)
+        _check_schema(reader.schema, columns)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        reader = pa.ipc.open_stream(file)
+        _check_schema(reader.schema, columns)
+        batches = iter(reader)
+    return fmt, (batch.select(list(columns)) for batch in batches)
+
+
+def batch_columns(batch, columns):
+    """
+    Colonnes d'un RecordBatch au format de KidneyPreprocessingPipeline.transform_columns.
+
+    Les colonnes numériques sans valeur manquante sont des vues sur les tampons
+    Arrow (aucune copie) ; les colonnes texte restent codées par dictionnaire :
+    seules leurs valeurs distinctes deviennent des objets Python.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arrays = {}
+    for col in columns:
+        array = batch.column(col)
+        if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+            array = array.dictionary_encode()
+        if pa.types.is_dictionary(array.type):
+            indices = pc.fill_null(array.indices, -1).to_numpy(zero_copy_only=False)
+            arrays[col] = (array.dictionary.to_numpy(zero_copy_only=False), indices)
+        else:
+            arrays[col] = array.to_numpy(zero_copy_only=False)
+    return arrays
+
+
+class _ChunkSink():
+    """
+    Fichier en écriture seule dont le contenu est récupéré au fur et à mesure
+    (`drain`), pour envoyer la réponse pendant l'écriture.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+class PredictionWriter():
+    """
+    Écrit les prédictions en colonnes (id, code, prediction, error) au format
+    Parquet ou flux Arrow IPC. Codes et libellés sont des colonnes codées par
+    dictionnaire qui réutilisent directement le tableau des prédictions ;
+    `error` n'est renseignée que par la ligne d'erreur d'un flux interrompu.
+    """
+
+    def __init__(self, fmt, target_classes, labels):
+        import pyarrow as pa
+
+        self.fmt = "parquet" if fmt == "parquet" else "arrow"
+        self.codes = pa.array([str(code) for code in target_classes])
+        self.labels = pa.array([labels[str(code)] for code in target_classes])
+        self.schema = pa.schema([
+            ("id", pa.int64()),
+            ("code", pa.dictionary(pa.int32(), pa.string())),
+            ("prediction", pa.dictionary(pa.int32(), pa.string())),
+            ("error", pa.string())
+        ])
+        self.sink = _ChunkSink()
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self.writer = pq.ParquetWriter(self.sink, self.schema)
+        else:
+            self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    @property
+    def media_type(self):
+        return MEDIA_TYPES[self.fmt]
+
+    def write(self, predictions, offset):
+        """
+        Ajoute un bloc de prédictions (ids à partir de `offset`) et retourne les octets produits.
+        """
+        import pyarrow as pa
+
+        indices = pa.array(np.asarray(predictions, dtype=np.int32))
+        batch = pa.record_batch([
+            pa.array(np.arange(offset, offset + len(predictions), dtype=np.int64)),
+            pa.DictionaryArray.from_arrays(indices, self.codes),
+            pa.DictionaryArray.from_arrays(indices, self.labels),
+            pa.nulls(len(predictions), pa.string())
+        ], schema=self.schema)
+        return self._write_batch(batch)
+
+    def write_error(self, message, offset):
+        """
+        Ajoute une ligne d'erreur (id du premier patient non prédit, code et
+        prediction nuls) : le statut HTTP est déjà parti quand un lot échoue.
+        """
+        import pyarrow as pa
+
+        no_code = pa.array([None], type=pa.int32())
+        batch = pa.record_batch([
+            pa.array([offset], type=pa.int64()),
+            pa.DictionaryArray.from_arrays(no_code, self.codes),
+            pa.DictionaryArray.from_arrays(no_code, self.labels),
+            pa.array([message], type=pa.string())
+        ], schema=self.schema)
+        return self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        import pyarrow as pa
+
+        if self.fmt == "parquet":
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+        return self.sink.drain()
+
+    def close(self):
+        self.writer.close()
+        return self.sink.drain()
@@ -0,0 +1,155 @@
+import copy
+import json
+import pickle
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+
+from forest_inference import CompiledForest
+
+
+# Grilles explorées par défaut : nombre d'arbres, profondeur maximale et
+# élagage coût-complexité (ccp_alpha)
+N_ESTIMATORS_GRID = (5, 10, 25, 50, 100)
+MAX_DEPTH_GRID = (None, 12, 8, 6, 4)
+CCP_ALPHA_GRID = (0.0, 0.001, 0.005, 0.01)
+
+REPORT_FILENAME = "forest_compaction_report.json"
+
+
+def truncate_forest(forest, n_estimators):
+    """
+    Forêt réduite à ses `n_estimators` premiers arbres (partagés, sans réentraînement).
+    """
+    compact = copy.copy(forest)
+    compact.estimators_ = forest.estimators_[:n_estimators]
+    compact.n_estimators = n_estimators
+    return compact
+
+
+def model_size(model):
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def node_count(forest):
+    return int(sum(estimator.tree_.node_count for estimator in forest.estimators_))
+
+
+def time_predict(predict, X, min_time=0.2):
+    """
+    Durée moyenne d'un appel à `predict(X)`, en millisecondes.
+    """
+    predict(X)
+    n_calls = 0
+    start = time.perf_counter()
+    while True:
+        predict(X)
+        n_calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return 1000 * elapsed / n_calls
+
+
+def measure(forest, X_eval, y_eval, min_time=0.2):
+    """
+    F1 (pondéré, comme l'entraînement) sur X_eval, taille sérialisée, nombre de
+    nœuds et latence de predict : une ligne et tout X_eval avec sklearn, une
+    ligne avec la forêt compilée (moteurs 'numpy' / 'numba' de l'API).
+    """
+    X_eval = np.asarray(X_eval, dtype=np.float32)
+    y_pred = forest.predict(X_eval)
+    compiled = CompiledForest(forest)
+    return {
+        "n_estimators": len(forest.estimators_),
+        "max_depth": forest.max_depth,
+        "ccp_alpha": forest.ccp_alpha,
+        "f1_score": float(f1_score(y_eval, y_pred, average="weighted")),
+        "size_bytes": model_size(forest),
+        "node_count": node_count(forest),
+        "predict_1_ms": time_predict(forest.predict, X_eval[:1], min_time),
+        "predict_batch_us_per_row": 1000 * time_predict(forest.predict, X_eval, min_time) / len(X_eval),
+        "compiled_predict_1_ms": time_predict(compiled.predict, X_eval[:1], min_time)
+    }
+
+
+def compact_forest(forest, X_train, y_train, tolerance=0.01, n_estimators_grid=N_ESTIMATORS_GRID,
+                   max_depth_grid=MAX_DEPTH_GRID, ccp_alpha_grid=CCP_ALPHA_GRID, validation_size=0.25,
+                   random_state=42, min_time=0.2):
+    """
+    Cherche la plus petite forêt dont le F1 reste à moins de `tolerance` (en
+    absolu) de celui de `forest`, sans toucher à l'ensemble de test : X_train
+    est découpé (stratifié) en une partie d'ajustement et une partie de
+    validation (`validation_size`), sur laquelle les candidates et la forêt
+    d'origine, réentraînée sur la même partie, sont comparées.
+
+    Une forêt est entraînée par couple (max_depth, ccp_alpha), avec le plus
+    grand nombre d'arbres de la grille ; les forêts plus petites en sont les
+    premiers arbres, sans réentraînement. La candidate retenue (la plus petite
+    une fois sérialisée, puis la plus rapide) est ensuite réentraînée sur tout
+    X_train. Retourne cette forêt et le rapport de toutes les candidates, la
+    forêt d'origine en tête.
+    """
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=validation_size, stratify=y_train, random_state=random_state
+    )
+
+    baseline = measure(clone(forest).fit(X_fit, y_fit), X_val, y_val, min_time)
+    baseline["candidate"] = "original"
+    candidates = [(None, baseline)]
+
+    n_max = max(n_estimators_grid)
+    for max_depth in max_depth_grid:
+        for ccp_alpha in ccp_alpha_grid:
+            params = {"n_estimators": n_max, "max_depth": max_depth, "ccp_alpha": ccp_alpha, "random_state": random_state}
+            full = clone(forest).set_params(**params).fit(X_fit, y_fit)
+            for n_estimators in sorted(n_estimators_grid):
+                compact = truncate_forest(full, n_estimators)
+                result = measure(compact, X_val, y_val, min_time)
+                result["candidate"] = f"n_estimators={n_estimators}, max_depth={max_depth}, ccp_alpha={ccp_alpha}"
+                candidates.append((params, result))
+
+    min_f1 = baseline["f1_score"] - tolerance
+    for _, result in candidates:
+        result["within_tolerance"] = result["f1_score"] >= min_f1
+    eligible = [(params, result) for params, result in candidates if result["within_tolerance"]]
+    params, best_result = min(eligible, key=lambda item: (item[1]["size_bytes"], item[1]["predict_1_ms"]))
+    best_result["selected"] = True
+
+    # Forêt retenue réentraînée sur tout X_train : n_estimators cohérent avec ses
+    # arbres, sans référence à la grande forêt
+    if params is None:
+        best = forest
+    else:
+        full = clone(forest).set_params(**params).fit(X_train, y_train)
+        best = copy.deepcopy(truncate_forest(full, best_result["n_estimators"]))
+    report = {
+        "tolerance": tolerance,
+        "validation_size": validation_size,
+        "baseline_f1_score": baseline["f1_score"],
+        "selected": best_result["candidate"],
+        "candidates": [result for _, result in candidates]
+    }
+    return best, report
+
+
+def print_report(report):
+    print(
+        f"\n🌲 Compaction de la forêt (tolérance F1 : {report['tolerance']}, F1 d'origine en validation :"
+        f" {report['baseline_f1_score']:.4f})"
+    )
+    print(f"{'candidate':<48} {'F1':>7} {'taille':>10} {'nœuds':>7} {'1 ligne':>10} {'lot/ligne':>10} {'compilée':>10}")
+    for result in report["candidates"]:
+        mark = "🏆" if result.get("selected") else ("✅" if result["within_tolerance"] else "  ")
+        print(
+            f"{result['candidate']:<48} {result['f1_score']:7.4f} {result['size_bytes'] / 1024:8.1f} Ko"
+            f" {result['node_count']:7d} {result['predict_1_ms']:7.3f} ms {result['predict_batch_us_per_row']:7.2f} µs"
+            f" {result['compiled_predict_1_ms']:7.3f} ms {mark}"
+        )
+
+
+def save_report(report, filename=REPORT_FILENAME):
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2, default=str)
@@ -0,0 +1,207 @@
+import importlib.util
+import os
+
+import joblib
+import numpy as np
+
+
+# Moteurs d'inférence disponibles pour l'API
+ENGINES = ("sklearn", "numpy", "numba")
+
+# numba n'est importé (et le noyau compilé) qu'au premier usage du moteur 'numba'
+_numba_kernel = None
+
+
+def numba_available():
+    return importlib.util.find_spec("numba") is not None
+
+
+class CompiledForest():
+    """
+    Forêt aléatoire (ou arbre de décision) sklearn compilée en tableaux NumPy
+    contigus : pour tous les arbres, caractéristique, seuil, enfants gauche/droit
+    et valeur des feuilles sont concaténés, les indices des enfants devenant
+    globaux. Tous les arbres sont parcourus en même temps, niveau par niveau,
+    sans passer par joblib ni par un appel Python par arbre.
+
+    `predict` et `predict_proba` reproduisent exactement sklearn (n_jobs=None) :
+    entrées converties en float32, comparaison `x <= seuil` en float64 et
+    accumulation des probabilités des arbres dans le même ordre.
+    """
+
+    def __init__(self, model, use_numba=False):
+        if use_numba and not numba_available():
+            raise ImportError("numba n'est pas installé : utiliser le moteur 'numpy'")
+
+        estimators = model.estimators_ if hasattr(model, "estimators_") else [model]
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+        self.n_estimators = len(estimators)
+        self.use_numba = use_numba
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            leaf = tree.children_left == -1
+            roots.append(offset)
+            # Les feuilles bouclent sur elles-mêmes : le parcours peut continuer sans test
+            nodes = np.arange(offset, offset + tree.node_count)
+            lefts.append(np.where(leaf, nodes, tree.children_left + offset))
+            rights.append(np.where(leaf, nodes, tree.children_right + offset))
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            values.append(self._leaf_values(tree.value[:, 0, :len(self.classes_)], leaf))
+            offset += tree.node_count
+
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64)
+        self.left = np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp)
+        self.right = np.ascontiguousarray(np.concatenate(rights), dtype=np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        # children[2 * noeud + 1] = enfant gauche, children[2 * noeud] = enfant droit
+        self.children = np.stack([self.right, self.left], axis=1).ravel()
+        self.max_depth = max(estimator.tree_.max_depth for estimator in estimators)
+
+    @staticmethod
+    def _leaf_values(value, leaf):
+        # sklearn >= 1.4 stocke déjà des fractions ; avant, des effectifs à normaliser
+        value = value.astype(np.float64)
+        totals = value[leaf].sum(axis=1)
+        if not np.allclose(totals, 1.0):
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+        return value
+
+    def apply(self, X, block_rows=4096):
+        """
+        Indice global de la feuille atteinte dans chaque arbre, forme (n_samples, n_estimators).
+        Les lignes sont traitées par blocs pour borner la mémoire des tableaux (n, n_estimators).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_features = X.shape[1]
+        leaves = np.empty((X.shape[0], self.n_estimators), dtype=np.intp)
+        for start in range(0, X.shape[0], block_rows):
+            flat = X[start:start + block_rows].ravel()
+            row_offsets = (np.arange(flat.shape[0] // n_features) * n_features)[:, np.newaxis]
+            node = np.broadcast_to(self.roots, (row_offsets.shape[0], self.n_estimators)).copy()
+            for _ in range(self.max_depth):
+                go_left = flat[row_offsets + self.feature[node]] <= self.threshold[node]
+                node = self.children[2 * node + go_left]
+            leaves[start:start + block_rows] = node
+        return leaves
+
+    def predict_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X doit avoir {self.n_features_in_} colonnes")
+
+        if self.use_numba:
+            proba = _get_numba_kernel()(
+                X, self.feature, self.threshold, self.left, self.right, self.value, self.roots, self.max_depth
+            )
+        else:
+            leaves = self.apply(X)
+            proba = np.zeros((X.shape[0], self.value.shape[1]), dtype=np.float64)
+            for t in range(self.n_estimators):
+                proba += self.value[leaves[:, t]]
+        proba /= self.n_estimators
+
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def _get_numba_kernel():
+    global _numba_kernel
+    if _numba_kernel is not None:
+        return _numba_kernel
+
+    import numba
+
+    @numba.njit(parallel=True, cache=True)
+    def predict_proba_numba(X, feature, threshold, left, right, value, roots, max_depth):
+        proba = np.zeros((X.shape[0], value.shape[1]), dtype=np.float64)
+        for i in numba.prange(X.shape[0]):
+            for t in range(roots.shape[0]):
+                node = roots[t]
+                for _ in range(max_depth):
+                    if left[node] == node:
+                        break
+                    if X[i, feature[node]] <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                for k in range(value.shape[1]):
+                    proba[i, k] += value[node, k]
+        return proba
+
+    _numba_kernel = predict_proba_numba
+    return _numba_kernel
+
+
+def load_engine(model, engine="sklearn"):
+    """
+    Retourne l'objet qui servira les prédictions : le modèle sklearn lui-même,
+    ou sa version compilée ('numpy' ou 'numba') si c'est une forêt ou un arbre.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Moteur d'inférence inconnu : {engine} (choix : {', '.join(ENGINES)})")
+    if engine == "sklearn":
+        return model
+    if not hasattr(model, "estimators_") and not hasattr(model, "tree_"):
+        print(f"⚠️ Le moteur '{engine}' ne s'applique qu'aux arbres : utilisation du modèle sklearn")
+        return model
+    return CompiledForest(model, use_numba=(engine == "numba"))
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def compiled_path_for(model_path):
+    return os.path.splitext(model_path)[0] + ".compiled.joblib"
+
+
+def load_predictor(model_path, engine="sklearn", mmap_mode="r"):
+    """
+    Charge le modèle servi avec ses tableaux projetés en mémoire (`mmap_mode`),
+    pour que les processus forkés partagent les mêmes pages.
+
+    Pour les moteurs compilés, la forêt compilée est gardée à côté du modèle
+    (`*.compiled.joblib`, recompilée si le fichier du modèle change) : les
+    démarrages suivants la chargent directement, sans importer sklearn.
+    Retourne le prédicteur et le chemin du fichier dont il est chargé.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Moteur d'inférence inconnu : {engine} (choix : {', '.join(ENGINES)})")
+    if engine == "sklearn":
+        return joblib.load(model_path, mmap_mode=mmap_mode), model_path
+
+    signature = file_signature(model_path)
+    compiled_path = compiled_path_for(model_path)
+    try:
+        forest = joblib.load(compiled_path, mmap_mode=mmap_mode)
+        if isinstance(forest, CompiledForest) and getattr(forest, "source_signature", None) == signature:
+            forest.use_numba = (engine == "numba")
+            return forest, compiled_path
+    except Exception:
+        pass
+
+    predictor = load_engine(joblib.load(model_path), engine)
+    if not isinstance(predictor, CompiledForest):
+        return predictor, model_path
+
+    predictor.source_signature = signature
+    try:
+        joblib.dump(predictor, compiled_path)
+    except OSError:
+        # Dossier en lecture seule : la forêt compilée reste en mémoire
+        return predictor, None
+    forest = joblib.load(compiled_path, mmap_mode=mmap_mode)
+    forest.use_numba = (engine == "numba")
+    return forest, compiled_path
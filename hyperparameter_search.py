@@ -0,0 +1,99 @@
+import time
+
+from scipy.stats import loguniform, randint, uniform
+from sklearn.base import clone
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV, StratifiedKFold
+
+
+# Espaces de recherche par famille de modèles. `resource` est la ressource
+# augmentée à chaque tour : nombre d'arbres pour les forêts et le boosting,
+# nombre de lignes d'entraînement pour les autres.
+SEARCH_SPACES = {
+    "Random Forest": {
+        "params": {
+            "max_depth": [None, 4, 6, 8, 12],
+            "min_samples_leaf": [1, 2, 4],
+            "max_features": ["sqrt", "log2", None],
+            "ccp_alpha": [0.0, 0.001, 0.01]
+        },
+        "resource": "n_estimators", "min_resources": 10, "max_resources": 270
+    },
+    "XGBoost": {
+        "params": {
+            "max_depth": randint(2, 9),
+            "learning_rate": loguniform(0.01, 0.3),
+            "subsample": uniform(0.6, 0.4),
+            "colsample_bytree": uniform(0.6, 0.4),
+            "min_child_weight": [1, 3, 5]
+        },
+        "resource": "n_estimators", "min_resources": 10, "max_resources": 270
+    },
+    "SVM": {
+        "params": {"C": loguniform(1e-2, 1e3), "gamma": loguniform(1e-4, 1), "kernel": ["rbf", "linear"]},
+        "resource": "n_samples"
+    },
+    "KNN": {
+        "params": {"n_neighbors": randint(1, 30), "weights": ["uniform", "distance"], "p": [1, 2]},
+        "resource": "n_samples"
+    },
+    "Logistic Regression": {
+        "params": {"C": loguniform(1e-3, 1e3), "solver": ["lbfgs", "liblinear"], "max_iter": [1000]},
+        "resource": "n_samples"
+    }
+}
+
+
+def space_key(space):
+    """
+    Description stable d'un espace de recherche (les lois scipy n'ont pas de repr reproductible), pour le cache.
+    """
+    params = {
+        name: (values.dist.name, values.args, values.kwds) if hasattr(values, "dist") else values
+        for name, values in space["params"].items()
+    }
+    return dict(space, params=params)
+
+
+def search_family(model, space, X, y, n_jobs=-1, cv=3, factor=3, scoring="f1_weighted", random_state=42):
+    """
+    Successive halving sur une famille de modèles : beaucoup de configurations
+    tirées au hasard sont évaluées avec peu de ressources, seul le meilleur
+    tiers (`factor`) passe au tour suivant avec trois fois plus de ressources.
+
+    Les configurations sont évaluées en parallèle sur `n_jobs` processus ; le
+    modèle lui-même reste sur un seul thread pour ne pas surcharger les cœurs.
+    Retourne le modèle configuré (non entraîné) et le bilan de la recherche.
+    """
+    model = clone(model)
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=1)
+
+    options = {}
+    if space["resource"] != "n_samples":
+        options = {"min_resources": space["min_resources"], "max_resources": space["max_resources"]}
+    search = HalvingRandomSearchCV(
+        model, space["params"], resource=space["resource"], factor=factor, scoring=scoring, n_jobs=n_jobs,
+        cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state), random_state=random_state,
+        refit=False, **options
+    )
+
+    started = time.perf_counter()
+    search.fit(X, y)
+    wall_time = time.perf_counter() - started
+
+    results = search.cv_results_
+    # Temps d'entraînement cumulé de toutes les configurations évaluées, tous plis confondus
+    fit_time = float(sum(results["mean_fit_time"]) * cv)
+    report = {
+        "best_params": {name: getattr(value, "item", lambda: value)() for name, value in search.best_params_.items()},
+        "best_score": float(search.best_score_),
+        "scoring": scoring,
+        "resource": space["resource"],
+        "n_candidates": [int(n) for n in search.n_candidates_],
+        "n_resources": [int(n) for n in search.n_resources_],
+        "n_evaluations": len(results["params"]),
+        "wall_time_s": wall_time,
+        "fit_time_s": fit_time
+    }
+    return clone(model).set_params(**search.best_params_), report
@@ -0,0 +1,155 @@
+import json
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.exceptions import NotFittedError
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.naive_bayes import GaussianNB
+
+
+# État des modèles incrémentaux, sauvegardé entre deux lots, et rapport de dérive
+INCREMENTAL_FILENAME = "incremental_models.pkl"
+DRIFT_REPORT_FILENAME = "incremental_drift_report.json"
+
+
+class WarmStartForest():
+    """
+    Forêt aléatoire mise à jour par lots : chaque lot ajoute `trees_per_batch`
+    arbres entraînés sur ce lot seulement (warm_start), les arbres existants
+    sont gardés tels quels. Un lot qui ne contient pas toutes les classes est
+    mis de côté et fusionné avec le suivant (les arbres d'une même forêt
+    doivent tous connaître les mêmes classes). Tant qu'aucun lot n'a ajouté
+    d'arbres, `predict` lève NotFittedError.
+    """
+
+    def __init__(self, trees_per_batch=20, random_state=42, **params):
+        self.trees_per_batch = trees_per_batch
+        self.forest = RandomForestClassifier(n_estimators=0, warm_start=True, random_state=random_state, **params)
+        self.pending = None
+
+    def partial_fit(self, X, y, classes=None):
+        if self.pending is not None:
+            X = np.concatenate([self.pending[0], X])
+            y = np.concatenate([self.pending[1], y])
+            self.pending = None
+        if classes is not None and len(np.unique(y)) < len(classes):
+            self.pending = (X, y)
+            return self
+
+        self.forest.set_params(n_estimators=self.forest.n_estimators + self.trees_per_batch)
+        self.forest.fit(X, y)
+        return self
+
+    @property
+    def n_estimators(self):
+        return self.forest.n_estimators
+
+    def _check_fitted(self):
+        if self.forest.n_estimators == 0:
+            raise NotFittedError(
+                "Forêt sans arbre : les lots reçus jusqu'ici ne contiennent pas toutes les classes"
+                f" ({len(self.pending[0]) if self.pending is not None else 0} lignes en attente)"
+            )
+
+    def predict(self, X):
+        self._check_fitted()
+        return self.forest.predict(X)
+
+    def predict_proba(self, X):
+        self._check_fitted()
+        return self.forest.predict_proba(X)
+
+
+# Modèles qui apprennent lot par lot (partial_fit), et leur équivalent entraîné
+# d'un coup sur toutes les données, pour mesurer la dérive
+INCREMENTAL_MODELS = {
+    "SGD": lambda: SGDClassifier(loss="log_loss", random_state=42),
+    "Naive Bayes": GaussianNB,
+    "Random Forest": WarmStartForest
+}
+
+
+def full_retrain_model(model_name, model):
+    """
+    Modèle de la même famille, non entraîné, à entraîner d'un coup sur tout l'historique.
+    """
+    if model_name == "Random Forest":
+        return RandomForestClassifier(n_estimators=max(model.n_estimators, 1), random_state=42)
+    return INCREMENTAL_MODELS[model_name]()
+
+
+def update(model, X, y, classes):
+    """
+    Met à jour le modèle avec un lot ; retourne la durée de la mise à jour.
+    """
+    started = time.perf_counter()
+    model.partial_fit(X, y, classes=classes)
+    return time.perf_counter() - started
+
+
+def evaluate(model, X_test, y_test):
+    y_pred = model.predict(X_test)
+    return {"accuracy": accuracy_score(y_test, y_pred), "f1_score": f1_score(y_test, y_pred, average='weighted')}
+
+
+def replay(model_names, X_initial, y_initial, batches, X_test, y_test):
+    """
+    Rejoue l'arrivée de lots étiquetés : les modèles incrémentaux sont
+    entraînés sur les données initiales puis mis à jour lot par lot ; après
+    chaque lot, un modèle de la même famille est réentraîné de zéro sur tout
+    l'historique. Une ligne par lot et par modèle : accuracy et F1 des deux
+    sur X_test, dérive (incrémental - complet) et durées.
+    """
+    classes = np.unique(np.concatenate([y_initial] + [y for _, y in batches]))
+    models = {model_name: INCREMENTAL_MODELS[model_name]() for model_name in model_names}
+    history_X, history_y = [X_initial], [y_initial]
+    rows = []
+    for batch, (X, y) in enumerate([(X_initial, y_initial)] + list(batches)):
+        if batch > 0:
+            history_X.append(X)
+            history_y.append(y)
+        X_all, y_all = np.concatenate(history_X), np.concatenate(history_y)
+
+        for model_name, model in models.items():
+            update_time = update(model, X, y, classes)
+            incremental = evaluate(model, X_test, y_test)
+
+            full = full_retrain_model(model_name, model)
+            started = time.perf_counter()
+            full.fit(X_all, y_all)
+            full_fit_time = time.perf_counter() - started
+            complete = evaluate(full, X_test, y_test)
+
+            rows.append({
+                "model": model_name,
+                "batch": batch,
+                "batch_rows": len(y),
+                "rows_seen": len(y_all),
+                "incremental_accuracy": incremental["accuracy"],
+                "full_accuracy": complete["accuracy"],
+                "accuracy_drift": incremental["accuracy"] - complete["accuracy"],
+                "incremental_f1_score": incremental["f1_score"],
+                "full_f1_score": complete["f1_score"],
+                "f1_drift": incremental["f1_score"] - complete["f1_score"],
+                "update_time_s": update_time,
+                "full_fit_time_s": full_fit_time
+            })
+    return rows
+
+
+def print_report(rows):
+    print(f"\n{'modèle':<15}{'lot':>5}{'lignes':>8}{'acc. incr.':>12}{'acc. complet':>14}{'dérive':>9}{'màj (ms)':>10}{'complet (ms)':>14}")
+    for row in rows:
+        print(
+            f"{row['model']:<15}{row['batch']:>5}{row['rows_seen']:>8}{row['incremental_accuracy']:>12.4f}"
+            f"{row['full_accuracy']:>14.4f}{row['accuracy_drift']:>+9.4f}{1000 * row['update_time_s']:>10.1f}"
+            f"{1000 * row['full_fit_time_s']:>14.1f}"
+        )
+
+
+def save_report(rows, path=DRIFT_REPORT_FILENAME):
+    with open(path, "w") as f:
+        json.dump(rows, f, indent=2)
+    return path
@@ -0,0 +1,291 @@
+from bisect import bisect_left
+
+import numpy as np
+import joblib
+
+# pandas n'est importé que par les fonctions qui en ont besoin (ajustement,
+# transformation de DataFrame) : le chemin PatientVectorizer de l'API s'en passe.
+
+
+# Colonnes supprimées pour éviter la multicolinéarité (voir Kidney_Disease_Dataset.py)
+COLUMNS_TO_DROP = ['pcv', 'bu']
+
+# Colonnes brutes attendues en entrée (ordre du fichier kidney_disease.csv, sans 'id')
+INPUT_COLUMNS = [
+    "age", "bp", "sg", "al", "su", "rbc", "pc", "pcc", "ba",
+    "bgr", "bu", "sc", "sod", "pot", "hemo", "pcv", "wc", "rc",
+    "htn", "dm", "cad", "appet", "pe", "ane"
+]
+
+# Nom du fichier de l'artefact de prétraitement, sauvegardé à côté du modèle
+PIPELINE_FILENAME = "preprocessing_pipeline.pkl"
+
+
+def correct_incorrectly_encoded_columns(data):
+    import pandas as pd
+
+    # Correction des valeurs mal encodées. Les NaN deviennent la chaîne "nan"
+    # (comportement de astype(str) lors de l'entraînement) : pour 'dm' et 'cad',
+    # "nan" est donc une catégorie à part entière dans les données encodées.
+    columns_to_fix = ['pcv', 'wc', 'rc', 'dm', 'cad', 'classification']
+    for col in columns_to_fix:
+        if col in data.columns:
+            data[col] = data[col].astype(object).fillna("nan").astype(str).str.strip().str.replace("\t", "").replace("?", np.nan)
+
+    # Conversion des colonnes numériques mal encodées
+    cols_to_convert = ['pcv', 'wc', 'rc']
+    for col in cols_to_convert:
+        if col in data.columns:
+            data[col] = pd.to_numeric(data[col], errors='coerce')
+
+    return data
+
+
+def most_frequent(values):
+    """
+    Valeur la plus fréquente (hors NaN), la plus petite en cas d'égalité,
+    comme SimpleImputer(strategy="most_frequent").
+    """
+    counts = values.dropna().value_counts()
+    return min(counts.index[counts == counts.max()])
+
+
+def clean_category(value):
+    """
+    Nettoyage d'une valeur catégorique hors table (espaces, tabulations, NaN -> "nan").
+    """
+    if value is None or value != value:
+        return "nan"
+    return str(value).strip().replace("\t", "")
+
+
+class KidneyPreprocessingPipeline():
+    """
+    Prétraitement ajusté une seule fois sur les données d'entraînement :
+    modes pour l'imputation, tables valeur -> code (LabelEncoder) et
+    paramètres du MinMaxScaler(feature_range=(-1, 1)).
+
+    `transform` n'ajuste plus rien : il applique les tables sauvegardées.
+    """
+
+    def __init__(self, columns_to_drop=COLUMNS_TO_DROP, feature_range=(-1, 1), target_col='classification'):
+        self.columns_to_drop = list(columns_to_drop)
+        self.feature_range = feature_range
+        self.target_col = target_col
+
+    def fit(self, data):
+        """
+        Ajuste le pipeline sur le jeu de données brut (kidney_disease.csv).
+        """
+        data = data.drop(columns=['id'], errors='ignore')
+        data = correct_incorrectly_encoded_columns(data.copy())
+
+        self.input_columns = [col for col in data.columns if col != self.target_col]
+        self.feature_columns = [col for col in self.input_columns if col not in self.columns_to_drop]
+        self.categorical_columns = data[self.input_columns].select_dtypes(include=['object']).columns.tolist()
+
+        # Modes et tables de codage (valeurs triées, comme LabelEncoder)
+        self.modes = {}
+        self.codes = {}
+        for col in self.input_columns:
+            self.modes[col] = most_frequent(data[col])
+            self.codes[col] = np.array(sorted(data[col].dropna().unique()))
+
+        # Classes de la cible : le code prédit par le modèle est l'indice dans cette table
+        if self.target_col in data.columns:
+            self.target_classes = np.array(sorted(data[self.target_col].dropna().unique()))
+
+        # Paramètres du MinMaxScaler sur les données encodées
+        encoded = self._encode({col: data[col].to_numpy() for col in self.feature_columns})
+        self._set_scaler_params(encoded.min(axis=0), encoded.max(axis=0))
+
+        return self
+
+    def set_scaler(self, scaler):
+        """
+        Reprend les min/max d'un MinMaxScaler déjà ajusté (celui de l'entraînement).
+        """
+        if len(scaler.data_min_) != len(self.feature_columns):
+            raise ValueError(
+                f"Le scaler attend {len(scaler.data_min_)} colonnes, le pipeline en produit {len(self.feature_columns)}"
+            )
+        self.feature_range = scaler.feature_range
+        self._set_scaler_params(scaler.data_min_, scaler.data_max_)
+
+        return self
+
+    def _set_scaler_params(self, data_min, data_max):
+        self.data_min = np.asarray(data_min, dtype=np.float64)
+        self.data_max = np.asarray(data_max, dtype=np.float64)
+        data_range = self.data_max - self.data_min
+        data_range[data_range == 0.0] = 1.0
+        self.scale = (self.feature_range[1] - self.feature_range[0]) / data_range
+        self.min = self.feature_range[0] - self.data_min * self.scale
+
+    def __getstate__(self):
+        # Les index pandas sont reconstruits à la demande : l'artefact se charge sans pandas
+        state = self.__dict__.copy()
+        state.pop("indexes", None)
+        return state
+
+    def _index(self, col):
+        import pandas as pd
+
+        if "indexes" not in self.__dict__:
+            self.indexes = {}
+        if col not in self.indexes:
+            self.indexes[col] = pd.Index(self.codes[col])
+        return self.indexes[col]
+
+    def _encode_column(self, col, values):
+        import pandas as pd
+
+        if col in self.categorical_columns:
+            # Recherche par table de hachage ; nettoyage seulement pour les valeurs absentes
+            index = self._index(col)
+            codes = index.get_indexer(values)
+            unknown = codes < 0
+            if unknown.any():
+                codes[unknown] = index.get_indexer([clean_category(value) for value in values[unknown]])
+                codes[codes < 0] = index.get_loc(self.modes[col])
+            return codes
+
+        if values.dtype == object:
+            values = pd.to_numeric(
+                pd.Series(values, dtype=object).astype(str).str.strip().str.replace("\t", ""), errors='coerce'
+            ).to_numpy()
+        values = values.astype(np.float64)
+        values[np.isnan(values)] = self.modes[col]
+        table = self.codes[col]
+        return np.minimum(np.searchsorted(table, values), len(table) - 1)
+
+    def _encode(self, columns):
+        n_rows = None
+        encoded = None
+        for j, col in enumerate(self.feature_columns):
+            values = columns[col]
+            if isinstance(values, tuple):
+                # Colonne codée par dictionnaire : seules les valeurs distinctes sont
+                # codées ; l'indice -1 (valeur manquante) désigne l'entrée None ajoutée
+                dictionary, indices = values
+                codes = self._encode_column(col, np.append(np.asarray(dictionary, dtype=object), None))
+                codes = codes[indices]
+            else:
+                codes = self._encode_column(col, values)
+            if encoded is None:
+                n_rows = len(codes)
+                encoded = np.empty((n_rows, len(self.feature_columns)), dtype=np.float64)
+            encoded[:, j] = codes
+        return encoded
+
+    def transform(self, data):
+        """
+        Applique le prétraitement (nettoyage, imputation, codage, suppression
+        de pcv/bu et normalisation) sans rien réajuster.
+        """
+        return self.transform_columns({col: data[col].to_numpy() for col in self.feature_columns})
+
+    def transform_columns(self, columns):
+        """
+        Comme `transform`, à partir d'un dict colonne -> tableau NumPy 1-D (sans
+        pandas), ou colonne -> (valeurs distinctes, indices) pour une colonne
+        codée par dictionnaire, comme les chaînes lues depuis Parquet ou Arrow.
+        """
+        encoded = self._encode(columns)
+        encoded *= self.scale
+        encoded += self.min
+
+        return encoded
+
+    def decode_target(self, codes):
+        """
+        Convertit les codes prédits par le modèle en libellés ('ckd' / 'notckd').
+        """
+        return self.target_classes[np.asarray(codes, dtype=np.intp)]
+
+    def encode_target(self, labels):
+        """
+        Convertit les libellés de nouveaux cas étiquetés ('ckd' / 'notckd') en codes du modèle.
+        """
+        labels = np.array([clean_category(label) for label in labels], dtype=object)
+        codes = np.minimum(np.searchsorted(self.target_classes, labels), len(self.target_classes) - 1)
+        unknown = self.target_classes[codes] != labels
+        if unknown.any():
+            raise ValueError(f"Classes inconnues : {sorted(set(labels[unknown]))}")
+        return codes
+
+    def save(self, path=PIPELINE_FILENAME):
+        joblib.dump(self, path)
+        return path
+
+    @staticmethod
+    def load(path=PIPELINE_FILENAME):
+        return joblib.load(path)
+
+
+class PatientVectorizer():
+    """
+    Chemin rapide sans pandas : écrit un patient déjà validé (PatientData ou tout
+    objet exposant les champs de INPUT_COLUMNS en attributs) directement dans une
+    ligne NumPy. Les tables de codage et la normalisation du pipeline sont
+    précalculées : chaque champ catégorique est une recherche dans un dict qui
+    donne la valeur normalisée, chaque champ numérique une recherche dichotomique.
+    Produit exactement le même résultat que `KidneyPreprocessingPipeline.transform`.
+    """
+
+    def __init__(self, pipeline, dtype=np.float64):
+        self.dtype = dtype
+        self.fields = list(pipeline.input_columns)
+        # pcv et bu sont ignorés par leur indice dans les champs d'entrée
+        self.drop_indices = [self.fields.index(col) for col in pipeline.columns_to_drop if col in self.fields]
+        self.feature_indices = [i for i in range(len(self.fields)) if i not in self.drop_indices]
+        self.n_features = len(self.feature_indices)
+
+        self.steps = []
+        for j, i in enumerate(self.feature_indices):
+            col = self.fields[i]
+            table = pipeline.codes[col]
+            scaled = [float(code * pipeline.scale[j] + pipeline.min[j]) for code in range(len(table))]
+            if col in pipeline.categorical_columns:
+                lookup = dict(zip(table.tolist(), scaled))
+                self.steps.append((col, lookup, lookup[pipeline.modes[col]], None, None))
+            else:
+                mode = float(pipeline.modes[col])
+                self.steps.append((col, None, mode, table.astype(np.float64).tolist(), scaled))
+
+    def fill(self, patient, row):
+        """
+        Remplit `row` (vecteur de taille n_features) avec les valeurs normalisées du patient.
+        """
+        for j, (col, lookup, default, table, scaled) in enumerate(self.steps):
+            value = getattr(patient, col)
+            if lookup is not None:
+                result = lookup.get(value)
+                if result is None:
+                    result = lookup.get(clean_category(value), default)
+                row[j] = result
+            else:
+                if value is None or value != value:
+                    value = default
+                code = bisect_left(table, value)
+                row[j] = scaled[code if code < len(scaled) else -1]
+        return row
+
+    def transform(self, patient, out=None):
+        """
+        Retourne une matrice (1, n_features) prête pour `model.predict`.
+        """
+        if out is None:
+            out = np.empty((1, self.n_features), dtype=self.dtype)
+        self.fill(patient, out[0])
+        return out
+
+    def transform_many(self, patients, out=None):
+        """
+        Empile plusieurs patients dans une matrice (n, n_features).
+        """
+        if out is None:
+            out = np.empty((len(patients), self.n_features), dtype=self.dtype)
+        for i, patient in enumerate(patients):
+            self.fill(patient, out[i])
+        return out
@@ -0,0 +1,255 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from kidney_preprocessing import PIPELINE_FILENAME
+
+
+# Organisation du registre :
+#   model_registry/CURRENT                      -> numéro de la version servie
+#   model_registry/<version>/model.pkl
+#   model_registry/<version>/preprocessing_pipeline.pkl
+#   model_registry/<version>/metadata.json
+REGISTRY_DIR = "model_registry"
+CURRENT_FILENAME = "CURRENT"
+MODEL_FILENAME = "model.pkl"
+METADATA_FILENAME = "metadata.json"
+
+# Version servie quand le registre est vide : les fichiers à la racine du projet
+DEFAULT_VERSION = "default"
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def read_current(registry_dir=REGISTRY_DIR):
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILENAME)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def set_current(registry_dir, version):
+    """
+    Change la version servie. Le pointeur est remplacé atomiquement (os.replace) :
+    chaque worker, même forké, le relit et bascule de lui-même.
+    """
+    if version != DEFAULT_VERSION and version not in list_versions(registry_dir):
+        raise KeyError(f"Version inconnue : {version}")
+    os.makedirs(registry_dir, exist_ok=True)
+    tmp_path = os.path.join(registry_dir, f".{CURRENT_FILENAME}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(registry_dir, CURRENT_FILENAME))
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    try:
+        names = os.listdir(registry_dir)
+    except OSError:
+        return []
+    versions = [name for name in names if os.path.isfile(os.path.join(registry_dir, name, MODEL_FILENAME))]
+    return sorted(versions, key=lambda v: (not v.isdigit(), int(v) if v.isdigit() else 0, v))
+
+
+def publish_model(model_path, pipeline_path=PIPELINE_FILENAME, registry_dir=REGISTRY_DIR, metadata=None, activate=True):
+    """
+    Copie un modèle et son prétraitement dans une nouvelle version du registre
+    (dossier préparé à part puis renommé, donc jamais visible à moitié écrit)
+    et, si `activate`, en fait la version servie.
+    """
+    os.makedirs(registry_dir, exist_ok=True)
+    numbers = [int(v) for v in list_versions(registry_dir) if v.isdigit()]
+    version = str(max(numbers, default=0) + 1)
+
+    tmp_dir = os.path.join(registry_dir, f".{version}.{os.getpid()}.tmp")
+    os.makedirs(tmp_dir)
+    shutil.copyfile(model_path, os.path.join(tmp_dir, MODEL_FILENAME))
+    shutil.copyfile(pipeline_path, os.path.join(tmp_dir, PIPELINE_FILENAME))
+    metadata = dict(metadata or {}, version=version, source=os.path.basename(model_path), published_at=time.time())
+    with open(os.path.join(tmp_dir, METADATA_FILENAME), "w") as f:
+        json.dump(metadata, f, indent=2, default=str)
+    os.rename(tmp_dir, os.path.join(registry_dir, version))
+
+    if activate:
+        set_current(registry_dir, version)
+    return version
+
+
+class ModelRegistry():
+    """
+    Versions du modèle chargées par le processus et version servie.
+
+    Un thread surveille le pointeur CURRENT du registre (et le fichier du modèle
+    servi) ; une nouvelle version est chargée et préchauffée en arrière-plan
+    par `load_fn`, puis remplace l'ancienne d'une seule affectation. Les
+    requêtes en cours gardent la version qu'elles ont obtenue ; une version
+    retirée n'est fermée qu'après `retire_grace_s` secondes.
+
+    Une version peut aussi être demandée explicitement (`get(version)`) : elle
+    est alors chargée à la demande et gardée parmi les `max_loaded` dernières.
+    """
+
+    def __init__(self, load_fn, registry_dir=REGISTRY_DIR, default_model_path=None, default_pipeline_path=PIPELINE_FILENAME,
+                 poll_interval_s=2.0, max_loaded=3, retire_grace_s=60.0):
+        self.load_fn = load_fn
+        self.registry_dir = registry_dir
+        self.default_model_path = default_model_path
+        self.default_pipeline_path = default_pipeline_path
+        self.poll_interval = poll_interval_s
+        self.max_loaded = max(1, max_loaded)
+        self.retire_grace = retire_grace_s
+        self.loaded = OrderedDict()
+        self.current = None
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.poller = None
+        self.pid = None
+        self.n_reloads = 0
+        self.last_error = None
+
+    def paths(self, version):
+        if version == DEFAULT_VERSION:
+            return self.default_model_path, self.default_pipeline_path
+        version_dir = os.path.join(self.registry_dir, version)
+        if os.path.sep in version or version.startswith(".") or not os.path.isfile(os.path.join(version_dir, MODEL_FILENAME)):
+            raise KeyError(f"Version inconnue : {version}")
+        return os.path.join(version_dir, MODEL_FILENAME), os.path.join(version_dir, PIPELINE_FILENAME)
+
+    def target_version(self):
+        return read_current(self.registry_dir) or DEFAULT_VERSION
+
+    def _load(self, version):
+        model_path, pipeline_path = self.paths(version)
+        signature = file_signature(model_path)
+        bundle = self.load_fn(version, model_path, pipeline_path)
+        bundle.source_signature = signature
+        return bundle
+
+    def start(self):
+        """
+        Charge la version servie (au démarrage, de façon bloquante) puis lance la surveillance.
+        """
+        bundle = self._load(self.target_version())
+        with self.lock:
+            self.loaded[bundle.version] = bundle
+            self.current = bundle
+        self._ensure_poller()
+        return bundle
+
+    def _ensure_poller(self):
+        # Après un fork, le thread de surveillance du parent n'existe plus : on le relance
+        if self.poll_interval <= 0:
+            return
+        if self.poller is not None and self.pid == os.getpid() and self.poller.is_alive():
+            return
+        self.pid = os.getpid()
+        self.poller = threading.Thread(target=self._poll, name="model-registry-poller", daemon=True)
+        self.poller.start()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.check()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def check(self):
+        """
+        Charge et active la version cible si elle a changé, ou si le fichier du
+        modèle servi a été remplacé. Retourne True si une bascule a eu lieu.
+        """
+        with self.load_lock:
+            version = self.target_version()
+            model_path, _ = self.paths(version)
+            signature = file_signature(model_path)
+            current = self.current
+            if current is not None and current.version == version and current.source_signature == signature:
+                return False
+
+            # Version déjà en mémoire et inchangée : simple bascule. Sinon chargement
+            # et préchauffage pendant que l'ancienne version continue de servir.
+            previous = self.loaded.get(version)
+            if previous is not None and previous.source_signature == signature:
+                bundle = previous
+            else:
+                bundle = self._load(version)
+            with self.lock:
+                self.loaded.pop(version, None)
+                self.loaded[version] = bundle
+                self.current = bundle
+                retired = self._evict()
+            if previous is not None and previous is not bundle:
+                retired.append(previous)
+            self.n_reloads += 1
+            self.last_error = None
+
+        self._retire(retired)
+        return True
+
+    def get(self, version=None):
+        """
+        Version servie (par défaut) ou version demandée, chargée si besoin.
+        """
+        self._ensure_poller()
+        if version is None:
+            return self.current
+
+        with self.lock:
+            bundle = self.loaded.get(version)
+            if bundle is not None:
+                self.loaded.move_to_end(version)
+                return bundle
+
+        self.paths(version)
+        with self.load_lock:
+            bundle = self.loaded.get(version)
+            if bundle is None:
+                bundle = self._load(version)
+                with self.lock:
+                    self.loaded[version] = bundle
+                    retired = self._evict()
+                self._retire(retired)
+        return bundle
+
+    def _evict(self):
+        retired = []
+        for version in list(self.loaded):
+            if len(self.loaded) <= self.max_loaded:
+                break
+            if self.loaded[version] is not self.current:
+                retired.append(self.loaded.pop(version))
+        return retired
+
+    def _retire(self, bundles):
+        for bundle in bundles:
+            timer = threading.Timer(self.retire_grace, bundle.close)
+            timer.daemon = True
+            timer.start()
+
+    def close(self):
+        with self.lock:
+            bundles = list(self.loaded.values())
+        for bundle in bundles:
+            bundle.close()
+
+    def status(self):
+        current = self.current
+        return {
+            "current": current.version if current is not None else None,
+            "target": self.target_version(),
+            "loaded": list(self.loaded),
+            "available": [DEFAULT_VERSION] + list_versions(self.registry_dir),
+            "reloads": self.n_reloads,
+            "last_error": self.last_error
+        }
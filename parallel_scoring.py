@@ -0,0 +1,119 @@
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+
+from kidney_preprocessing import KidneyPreprocessingPipeline
+
+
+# État de chaque processus de calcul, chargé une seule fois par l'initialiseur
+_worker = {}
+
+
+def _init_worker(predictor_path, pipeline_path, engine="sklearn"):
+    # Les tableaux NumPy du fichier joblib (non compressé) sont projetés en mémoire :
+    # les processus partagent les mêmes pages au lieu d'en garder chacun une copie.
+    # Seule la forêt compilée (moteurs 'numpy' / 'numba') en profite : les arbres
+    # sklearn recopient leurs nœuds au chargement, chaque processus garde sa copie.
+    predictor = joblib.load(predictor_path, mmap_mode="r")
+    # Le noyau suit le moteur de l'API, pas la valeur enregistrée dans le fichier compilé
+    if hasattr(predictor, "use_numba"):
+        predictor.use_numba = (engine == "numba")
+    _worker["predictor"] = predictor
+    _worker["pipeline"] = KidneyPreprocessingPipeline.load(pipeline_path)
+
+
+def _score_shard(shard):
+    return _worker["predictor"].predict(_worker["pipeline"].transform(shard))
+
+
+class ParallelScorer():
+    """
+    Prétraitement et prédiction de gros CSV répartis sur plusieurs cœurs.
+
+    Les blocs lus par le processus principal sont envoyés à un pool de processus ;
+    au plus `2 * n_workers` blocs sont en cours à la fois pour borner la mémoire,
+    et les prédictions sont rassemblées dans l'ordre du fichier. En dessous de
+    `min_rows` lignes (ou avec un seul processus), tout reste dans le processus courant.
+    """
+
+    def __init__(self, predictor, pipeline, pipeline_path, n_workers=None, min_rows=200000, predictor_path=None,
+                 engine="sklearn"):
+        self.predictor = predictor
+        self.predictor_path = predictor_path
+        self.engine = engine
+        self.pipeline = pipeline
+        self.pipeline_path = pipeline_path
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self.executor = None
+        self.workdir = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        # Fichier du modèle servi s'il est connu, sinon copie non compressée projetable en mémoire
+        predictor_path = self.predictor_path
+        if predictor_path is None:
+            self.workdir = tempfile.mkdtemp(prefix="kidney_scoring_")
+            predictor_path = os.path.join(self.workdir, "predictor.joblib")
+            joblib.dump(self.predictor, predictor_path)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(predictor_path, self.pipeline_path, self.engine)
+        )
+
+    def _score_local(self, chunks):
+        return [self.predictor.predict(self.pipeline.transform(chunk)) for chunk in chunks]
+
+    def score(self, chunks):
+        """
+        Prédit une suite de blocs (DataFrame) et retourne le tableau des codes, dans l'ordre.
+        """
+        chunks = iter(chunks)
+        buffered = []
+        n_rows = 0
+        for chunk in chunks:
+            buffered.append(chunk)
+            n_rows += len(chunk)
+            if n_rows >= self.min_rows:
+                break
+        else:
+            return np.concatenate(self._score_local(buffered))
+
+        if self.n_workers <= 1:
+            return np.concatenate(self._score_local(itertools.chain(buffered, chunks)))
+
+        with self.lock:
+            if self.executor is None:
+                self._start()
+
+        results = []
+        in_flight = deque()
+        for shard in itertools.chain(buffered, chunks):
+            in_flight.append(self.executor.submit(_score_shard, shard))
+            if len(in_flight) >= 2 * self.n_workers:
+                results.append(in_flight.popleft().result())
+        results.extend(future.result() for future in in_flight)
+
+        return np.concatenate(results)
+
+    def shutdown(self):
+        with self.lock:
+            self._shutdown()
+
+    def _shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        if self.workdir is not None:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
@@ -0,0 +1,237 @@
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, confusion_matrix, classification_report, f1_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import MinMaxScaler
+
+from forest_compaction import time_predict
+
+try:
+    import resource
+except ImportError:  # Windows : pas de mesure de la mémoire
+    resource = None
+
+
+# Plis de validation croisée déjà chargés par chaque processus de calcul
+_folds = {}
+
+
+def core_budgets(model_names, n_workers, n_cores=None):
+    """
+    Threads accordés à chaque modèle : les cœurs sont partagés entre les
+    `n_workers` modèles entraînés en même temps, sans en demander plus qu'il
+    n'y en a. Les cœurs restants vont aux premiers modèles de la liste.
+    """
+    n_cores = n_cores or os.cpu_count() or 1
+    base, extra = divmod(n_cores, n_workers)
+    return {name: max(1, base + (i < extra)) for i, name in enumerate(model_names)}
+
+
+def _memory_mb():
+    """
+    Mémoire résidente actuelle et pic depuis la dernière remise à zéro, en Mo
+    (Linux) ; ailleurs, seulement le pic du processus (ru_maxrss).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(status["VmRSS"].split()[0]) / 1024, int(status["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        pass
+    if resource is None:
+        return None, None
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def _reset_peak_memory():
+    # Linux : ramène le pic (VmHWM) à la mémoire actuelle, pour mesurer chaque étape à part
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def benchmark_model(model, X, batch_rows=10000, min_time=0.2):
+    """
+    Coût de service d'un modèle entraîné : latence de predict pour une ligne
+    et pour `batch_rows` lignes (lignes de X répétées), pic mémoire pendant ces
+    prédictions et taille du fichier joblib tel que l'API le chargerait.
+    """
+    X = np.asarray(X)
+    X_batch = np.resize(X, (batch_rows, X.shape[1]))
+
+    _reset_peak_memory()
+    memory_before, _ = _memory_mb()
+    predict_1 = time_predict(model.predict, X[:1], min_time)
+    predict_batch = time_predict(model.predict, X_batch, min_time)
+    _, peak_memory = _memory_mb()
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return {
+        "predict_1_ms": predict_1,
+        "predict_batch_rows": batch_rows,
+        "predict_batch_ms": predict_batch,
+        "predict_peak_memory_mb": peak_memory,
+        "predict_memory_mb": peak_memory - memory_before if memory_before is not None else None,
+        "size_bytes": buffer.getbuffer().nbytes
+    }
+
+
+def fit_and_evaluate(model, X_train, y_train, X_test, y_test, n_threads=1):
+    """
+    Entraîne et évalue un modèle avec au plus `n_threads` threads (paramètre
+    `n_jobs` du modèle et bibliothèques BLAS / OpenMP). Retourne le modèle
+    entraîné et ses résultats, avec durée réelle, temps CPU et pic mémoire de
+    l'entraînement, puis latence de predict, mémoire et taille (benchmark_model).
+    """
+    from threadpoolctl import threadpool_limits
+
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=n_threads)
+
+    _reset_peak_memory()
+    memory_before, _ = _memory_mb()
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    with threadpool_limits(limits=n_threads):
+        model.fit(X_train, y_train)
+        fit_time = time.perf_counter() - wall_started
+        _, peak_memory = _memory_mb()
+        y_pred = model.predict(X_test)
+        cpu_time = time.process_time() - cpu_started
+        wall_time = time.perf_counter() - wall_started
+        benchmark = benchmark_model(model, X_test)
+
+    result = {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "f1_score": f1_score(y_test, y_pred, average='weighted'),
+        "confusion_matrix": confusion_matrix(y_test, y_pred),
+        "classification_report": classification_report(y_test, y_pred),
+        "n_threads": n_threads,
+        "fit_time_s": fit_time,
+        "wall_time_s": wall_time,
+        "cpu_time_s": cpu_time,
+        "peak_memory_mb": peak_memory,
+        "fit_memory_mb": peak_memory - memory_before if memory_before is not None else None
+    }
+    result.update(benchmark)
+    return model, result
+
+
+def train_models(models, X_train, y_train, X_test, y_test, n_workers=None, n_cores=None):
+    """
+    Entraîne et évalue les modèles en parallèle ; produit (nom, modèle entraîné,
+    résultats) au fur et à mesure qu'ils se terminent.
+
+    Chaque modèle est entraîné dans un processus neuf (spawn, une seule tâche
+    par processus) : le pic mémoire mesuré est bien le sien. Avec un seul
+    worker, tout reste dans le processus courant, l'un après l'autre (le pic
+    mémoire est alors celui du processus depuis son démarrage).
+    """
+    n_cores = n_cores or os.cpu_count() or 1
+    n_workers = max(1, min(n_workers or n_cores, len(models)))
+    budgets = core_budgets(list(models), n_workers, n_cores)
+
+    if n_workers == 1:
+        for name, model in models.items():
+            yield (name,) + fit_and_evaluate(model, X_train, y_train, X_test, y_test, budgets[name])
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"), max_tasks_per_child=1
+    ) as executor:
+        futures = {
+            executor.submit(fit_and_evaluate, model, X_train, y_train, X_test, y_test, budgets[name]): name
+            for name, model in models.items()
+        }
+        for future in as_completed(futures):
+            yield (futures[future],) + future.result()
+
+
+def cache_folds(X, y, workdir, n_splits=5, random_state=42):
+    """
+    Découpe stratifiée en `n_splits` plis, calculée une seule fois. Pour chaque
+    pli, le MinMaxScaler est ajusté sur sa partie entraînement et les tableaux
+    normalisés (X_train, y_train, X_test, y_test) sont écrits dans `workdir` :
+    tous les modèles les réutilisent sans rien réajuster. Retourne les indices
+    des plis et les chemins des fichiers.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    folds, paths = [], []
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    for i, (train_idx, test_idx) in enumerate(splitter.split(X, y)):
+        scaler = MinMaxScaler(feature_range=(-1, 1)).fit(X[train_idx])
+        path = os.path.join(workdir, f"fold_{i}.joblib")
+        joblib.dump((scaler.transform(X[train_idx]), y[train_idx], scaler.transform(X[test_idx]), y[test_idx]), path)
+        folds.append((train_idx, test_idx))
+        paths.append(path)
+    return folds, paths
+
+
+def _load_fold(path):
+    # Tableaux projetés en mémoire, chargés une fois par processus
+    fold = _folds.get(path)
+    if fold is None:
+        fold = _folds[path] = joblib.load(path, mmap_mode="r")
+    return fold
+
+
+def evaluate_fold(model, fold_path, n_threads=1):
+    """
+    Entraîne une copie non entraînée de `model` sur un pli et retourne son accuracy, son F1 et ses durées.
+    """
+    from threadpoolctl import threadpool_limits
+
+    X_train, y_train, X_test, y_test = _load_fold(fold_path)
+    model = clone(model)
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=n_threads)
+
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    with threadpool_limits(limits=n_threads):
+        model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+    return {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "f1_score": f1_score(y_test, y_pred, average='weighted'),
+        "wall_time_s": time.perf_counter() - wall_started,
+        "cpu_time_s": time.process_time() - cpu_started
+    }
+
+
+def cross_validate_models(models, fold_paths, n_workers=None, n_cores=None):
+    """
+    Évalue chaque modèle sur chaque pli, plis et modèles en parallèle ; produit
+    (nom, numéro du pli, résultats) au fur et à mesure. Les processus de calcul
+    sont réutilisés d'une tâche à l'autre et ne chargent chaque pli qu'une fois.
+    """
+    tasks = [(name, i) for name in models for i in range(len(fold_paths))]
+    n_cores = n_cores or os.cpu_count() or 1
+    n_workers = max(1, min(n_workers or n_cores, len(tasks)))
+    budgets = core_budgets(tasks, n_workers, n_cores)
+
+    if n_workers == 1:
+        for name, i in tasks:
+            yield name, i, evaluate_fold(models[name], fold_paths[i], budgets[(name, i)])
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {
+            executor.submit(evaluate_fold, models[name], fold_paths[i], budgets[(name, i)]): (name, i)
+            for name, i in tasks
+        }
+        for future in as_completed(futures):
+            yield futures[future] + (future.result(),)
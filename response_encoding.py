@@ -0,0 +1,130 @@
+import importlib.util
+import json
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+# Encodeurs JSON disponibles ; orjson et msgpack sont optionnels, importés au premier usage
+JSON_ENCODERS = ("orjson", "json")
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+
+def orjson_available():
+    return importlib.util.find_spec("orjson") is not None
+
+
+def msgpack_available():
+    return importlib.util.find_spec("msgpack") is not None
+
+
+def is_msgpack(media_type):
+    return bool(media_type) and media_type.split(";")[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def _plain(obj):
+    # Scalaires et tableaux NumPy pour json / msgpack (orjson les sérialise lui-même)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Type non sérialisable : {type(obj).__name__}")
+
+
+def dumps_json(content):
+    """
+    Sérialisation JSON de la bibliothèque standard, identique à la JSONResponse de FastAPI.
+    """
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_plain).encode("utf-8")
+
+
+def dumps_orjson(content):
+    import orjson
+
+    return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY, default=_plain)
+
+
+def dumps_msgpack(content):
+    import msgpack
+
+    return msgpack.packb(content, default=_plain)
+
+
+def loads_msgpack(data):
+    import msgpack
+
+    return msgpack.unpackb(data)
+
+
+class ResponseEncoder():
+    """
+    Encodage des réponses des endpoints de prédiction, sans passer par
+    `jsonable_encoder` : JSON (orjson ou bibliothèque standard, au choix) ou
+    msgpack quand l'en-tête Accept le demande et que msgpack est installé.
+    """
+
+    def __init__(self, json_encoder="orjson"):
+        if json_encoder not in JSON_ENCODERS:
+            raise ValueError(f"Encodeur JSON inconnu : {json_encoder} (choix : {', '.join(JSON_ENCODERS)})")
+        if json_encoder == "orjson" and not orjson_available():
+            print("⚠️ orjson n'est pas installé : utilisation du module json")
+            json_encoder = "json"
+        self.json_encoder = json_encoder
+        self.dumps = dumps_orjson if json_encoder == "orjson" else dumps_json
+        self.msgpack = msgpack_available()
+
+    def wants_msgpack(self, request):
+        if not self.msgpack:
+            return False
+        accept = request.headers.get("accept", "")
+        return any(is_msgpack(media_type) for media_type in accept.split(","))
+
+    def response(self, content, request, status_code=200, headers=None):
+        """
+        Réponse au format négocié par l'en-tête Accept (msgpack, sinon JSON).
+        """
+        if self.wants_msgpack(request):
+            return Response(dumps_msgpack(content), status_code, headers, media_type=MSGPACK_MEDIA_TYPE)
+        return Response(self.dumps(content), status_code, headers, media_type=JSON_MEDIA_TYPE)
+
+
+class MsgpackRequest(Request):
+    """
+    Requête au corps msgpack présentée à FastAPI comme du JSON déjà décodé :
+    la validation Pydantic s'applique sans ré-encodage intermédiaire.
+    """
+
+    def __init__(self, scope, receive):
+        headers = [(k, v) for k, v in scope["headers"] if k != b"content-type"]
+        headers.append((b"content-type", JSON_MEDIA_TYPE.encode()))
+        super().__init__(dict(scope, headers=headers), receive)
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            try:
+                self._json = loads_msgpack(body)
+            except Exception as e:
+                # Traité par FastAPI comme un corps JSON invalide (422)
+                raise json.JSONDecodeError(f"msgpack invalide : {e}", "", 0)
+        return self._json
+
+
+class MsgpackRoute(APIRoute):
+    """
+    Route qui accepte aussi les corps de requête msgpack (Content-Type: application/msgpack).
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request):
+            if is_msgpack(request.headers.get("content-type")):
+                if not msgpack_available():
+                    raise HTTPException(status_code=415, detail="msgpack n'est pas installé sur le serveur")
+                request = MsgpackRequest(request.scope, request.receive)
+            return await handler(request)
+
+        return route_handler
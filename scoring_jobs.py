@@ -0,0 +1,428 @@
+import io
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from kidney_preprocessing import INPUT_COLUMNS
+
+
+# Organisation du dossier des travaux :
+#   scoring_jobs/jobs.sqlite3                   -> état et progression de chaque travail
+#   scoring_jobs/<id>/input.csv                 -> fichier envoyé
+#   scoring_jobs/<id>/chunks/<n>.part           -> résultats de chaque bloc terminé
+JOBS_DIR = "scoring_jobs"
+DB_FILENAME = "jobs.sqlite3"
+INPUT_FILENAME = "input.csv"
+CHUNKS_DIRNAME = "chunks"
+
+OUTPUT_FORMATS = ("ndjson", "csv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT,
+    output TEXT NOT NULL,
+    model_version TEXT,
+    chunk_rows INTEGER NOT NULL,
+    input_bytes INTEGER NOT NULL,
+    bytes_done INTEGER NOT NULL DEFAULT 0,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    chunks_done INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    worker TEXT,
+    heartbeat REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    start_offset INTEGER NOT NULL,
+    end_offset INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        return f.readline()
+
+
+def check_columns(header, columns=INPUT_COLUMNS):
+    names = [name.strip().strip('"') for name in header.decode("utf-8-sig").strip().split(",")]
+    missing_columns = [col for col in columns if col not in names]
+    if missing_columns:
+        raise ValueError(f"Colonnes manquantes dans le CSV: {', '.join(missing_columns)}")
+
+
+def read_chunk(f, header, chunk_rows, columns=INPUT_COLUMNS):
+    """
+    Lit au plus `chunk_rows` lignes à partir de la position courante du fichier
+    (ouvert en binaire) ; retourne le DataFrame du bloc, ou None à la fin du
+    fichier. Les blocs sont découpés par lignes : les champs entre guillemets ne
+    doivent pas contenir de retour à la ligne. Les lignes vides sont ignorées
+    (comme pandas) et ne comptent pas dans `chunk_rows` : un bloc n'est jamais vide.
+    """
+    import pandas as pd
+
+    lines = []
+    for line in f:
+        if not line.strip():
+            continue
+        lines.append(line)
+        if len(lines) >= chunk_rows:
+            break
+    if not lines:
+        return None
+    data = io.BytesIO(header + b"".join(lines))
+    return pd.read_csv(data, usecols=lambda col: col in columns)
+
+
+class JobStore():
+    """
+    État des travaux de scoring dans une base SQLite locale (mode WAL),
+    partagée par les threads et les processus workers de l'API.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self.db_path = os.path.join(jobs_dir, DB_FILENAME)
+        os.makedirs(jobs_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Une connexion par opération : les objets sqlite3 ne passent pas d'un thread à l'autre
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Connection(conn)
+
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def input_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), INPUT_FILENAME)
+
+    def chunk_path(self, job_id, idx):
+        return os.path.join(self.job_dir(job_id), CHUNKS_DIRNAME, f"{idx:06d}.part")
+
+    def create(self, file, filename=None, output="ndjson", model_version=None, chunk_rows=50000):
+        """
+        Copie le fichier envoyé dans le dossier du travail et l'ajoute à la file.
+        Les colonnes sont vérifiées avant l'enregistrement.
+        """
+        if output not in OUTPUT_FORMATS:
+            raise ValueError("Format de sortie inconnu : utiliser 'ndjson' ou 'csv'")
+        job_id = uuid.uuid4().hex
+        job_dir = self.job_dir(job_id)
+        os.makedirs(os.path.join(job_dir, CHUNKS_DIRNAME))
+        try:
+            with open(self.input_path(job_id), "wb") as f:
+                shutil.copyfileobj(file, f, 1 << 20)
+            check_columns(read_header(self.input_path(job_id)))
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, status, filename, output, model_version, chunk_rows, input_bytes, created_at)"
+                    " VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                    (job_id, filename, output, model_version, chunk_rows, os.path.getsize(self.input_path(job_id)), time.time())
+                )
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _describe(row) if row is not None else None
+
+    def list(self, limit=50):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_describe(row) for row in rows]
+
+    def counts(self):
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def claim(self, worker, lease_s):
+        """
+        Prend le plus ancien travail en file, ou un travail en cours dont le
+        worker n'a plus donné signe de vie depuis `lease_s` secondes (arrêt ou
+        plantage) ; retourne son enregistrement, ou None.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat < ?)"
+                " ORDER BY created_at LIMIT 1",
+                (now - lease_s,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?, attempts = attempts + 1,"
+                " started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (worker, now, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return dict(job)
+
+    def resume_point(self, job_id):
+        """
+        Position de reprise : index du prochain bloc, décalage dans le fichier et id de sa première ligne.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT idx, end_offset, first_id + rows FROM chunks WHERE job_id = ? ORDER BY idx DESC LIMIT 1",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return 0, None, 0
+        return row[0] + 1, row[1], row[2]
+
+    def checkpoint(self, job_id, worker, idx, start_offset, end_offset, first_id, rows):
+        """
+        Enregistre un bloc terminé (son fichier de résultats est déjà en place)
+        et la progression du travail, dans une seule transaction. Lève
+        JobCancelled si le travail a été annulé ou repris par un autre worker.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE jobs SET bytes_done = ?, rows_done = rows_done + ?, chunks_done = chunks_done + 1, heartbeat = ?"
+                " WHERE id = ? AND worker = ? AND status = 'running'",
+                (end_offset, rows, now, job_id, worker)
+            ).rowcount
+            if not updated:
+                conn.execute("ROLLBACK")
+                raise JobCancelled(job_id)
+            conn.execute(
+                "INSERT INTO chunks (job_id, idx, start_offset, end_offset, first_id, rows) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, idx, start_offset, end_offset, first_id, rows)
+            )
+            conn.execute("COMMIT")
+
+    def heartbeat(self, job_id, worker):
+        """
+        Prolonge le bail du worker sur un travail en cours ; False si le travail
+        a été annulé ou repris par un autre worker.
+        """
+        with self._connect() as conn:
+            return bool(conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), job_id, worker)
+            ).rowcount)
+
+    def finish(self, job_id, worker, status="done", error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, heartbeat = NULL"
+                " WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, error, time.time(), job_id, worker)
+            )
+
+    def release(self, job_id, worker):
+        # Travail interrompu par l'arrêt du worker : remis en file, il reprendra à son dernier bloc
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, heartbeat = NULL"
+                " WHERE id = ? AND worker = ? AND status = 'running'",
+                (job_id, worker)
+            )
+
+    def chunk_indices(self, job_id):
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT idx FROM chunks WHERE job_id = ? ORDER BY idx", (job_id,))]
+
+    def iter_results(self, job_id, block_size=1 << 20):
+        """
+        Contenu des résultats d'un travail, bloc après bloc, dans l'ordre du fichier d'entrée.
+        """
+        for idx in self.chunk_indices(job_id):
+            with open(self.chunk_path(job_id, idx), "rb") as f:
+                while True:
+                    data = f.read(block_size)
+                    if not data:
+                        break
+                    yield data
+
+    def cancel(self, job_id):
+        """
+        Annule un travail. Ses fichiers sont supprimés tout de suite s'il n'est
+        pas en cours de calcul, sinon par son worker au prochain bloc.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = COALESCE(finished_at, ?) WHERE id = ?",
+                (time.time(), job_id)
+            )
+            conn.execute("COMMIT")
+        if row["status"] != "running":
+            self.remove_files(job_id)
+        return self.get(job_id)
+
+    def remove_files(self, job_id):
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+
+class _Connection():
+    # Connexion fermée à la sortie du bloc `with` (sqlite3.Connection ne ferme que la transaction)
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is not None and self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+        self.conn.close()
+
+
+def _describe(row):
+    job = dict(row)
+    job["progress"] = round(job["bytes_done"] / job["input_bytes"], 4) if job["input_bytes"] else 1.0
+    if job["status"] == "done":
+        job["progress"] = 1.0
+    for key in ("worker", "heartbeat", "chunk_rows"):
+        job.pop(key)
+    return job
+
+
+class JobRunner():
+    """
+    Threads de calcul des travaux de scoring.
+
+    Chaque worker prend un travail dans la file, lit le fichier par blocs de
+    `chunk_rows` lignes et appelle `score_fn(model_version, chunk, first_id, output)`
+    qui retourne les lignes de résultats. Chaque bloc terminé est écrit dans
+    son propre fichier puis enregistré avec la position atteinte dans le fichier
+    d'entrée : après un arrêt ou un plantage, le travail reprend au bloc suivant
+    (une fois le bail `lease_s` expiré) sans recalculer les blocs déjà faits.
+    Pendant le calcul d'un bloc, le bail est prolongé toutes les `lease_s / 3`
+    secondes : un bloc plus long que le bail n'est pas repris par un autre worker.
+    """
+
+    def __init__(self, store, score_fn, n_workers=1, poll_interval_s=1.0, lease_s=30.0):
+        self.store = store
+        self.score_fn = score_fn
+        self.n_workers = n_workers
+        self.poll_interval = poll_interval_s
+        self.lease = lease_s
+        self.threads = []
+        self.pid = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        # Comme pour la surveillance du registre, relancé après un fork
+        if self.n_workers <= 0:
+            return
+        if self.pid == os.getpid() and all(thread.is_alive() for thread in self.threads):
+            return
+        self.pid = os.getpid()
+        self.threads = []
+        for i in range(self.n_workers):
+            worker = f"{socket.gethostname()}:{os.getpid()}:{i}"
+            thread = threading.Thread(target=self._work, args=(worker,), name=f"scoring-job-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stopping.set()
+
+    def _work(self, worker):
+        while not self.stopping.is_set():
+            try:
+                job = self.store.claim(worker, self.lease)
+            except sqlite3.Error:
+                job = None
+            if job is None:
+                self.stopping.wait(self.poll_interval)
+                continue
+            self.run(job, worker)
+
+    def _keep_alive(self, job_id, worker, done, lost):
+        while not done.wait(self.lease / 3):
+            try:
+                if not self.store.heartbeat(job_id, worker):
+                    lost.set()
+                    return
+            except sqlite3.Error:
+                pass
+
+    def run(self, job, worker):
+        job_id = job["id"]
+        done = threading.Event()
+        lost = threading.Event()
+        keep_alive = threading.Thread(
+            target=self._keep_alive, args=(job_id, worker, done, lost), name=f"{worker}-heartbeat", daemon=True
+        )
+        keep_alive.start()
+        try:
+            if self._score(job, worker, lost):
+                self.store.finish(job_id, worker)
+            else:
+                self.store.release(job_id, worker)
+        except JobCancelled:
+            # Annulé : le worker supprime les fichiers ; repris par un autre worker : rien à faire
+            if (self.store.get(job_id) or {}).get("status") == "cancelled":
+                self.store.remove_files(job_id)
+        except Exception as e:
+            self.store.finish(job_id, worker, "failed", f"{type(e).__name__}: {e}")
+        finally:
+            done.set()
+
+    def _score(self, job, worker, lost):
+        # True si tout le fichier est prédit, False si le worker s'arrête avant la fin
+        job_id = job["id"]
+        input_path = self.store.input_path(job_id)
+        header = read_header(input_path)
+        idx, offset, first_id = self.store.resume_point(job_id)
+
+        with open(input_path, "rb") as f:
+            f.seek(offset if offset is not None else len(header))
+            while not self.stopping.is_set():
+                start_offset = f.tell()
+                chunk = read_chunk(f, header, job["chunk_rows"])
+                if chunk is None:
+                    return True
+                rows = self.score_fn(job["model_version"], chunk, first_id, job["output"])
+                if lost.is_set():
+                    raise JobCancelled(job_id)
+
+                # Résultats du bloc écrits à part puis renommés, puis bloc enregistré comme terminé
+                path = self.store.chunk_path(job_id, idx)
+                with open(path + ".tmp", "w", encoding="utf-8") as out:
+                    out.write(rows)
+                os.replace(path + ".tmp", path)
+                self.store.checkpoint(job_id, worker, idx, start_offset, f.tell(), first_id, len(chunk))
+                idx += 1
+                first_id += len(chunk)
+        return False
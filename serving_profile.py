@@ -0,0 +1,106 @@
+"""
+Profil de service d'un modèle, mesuré dans un processus Python neuf comme un
+worker de l'API : chargé avec le même moteur d'inférence (load_predictor),
+mémoire résidente après chargement, latence de predict ligne par ligne sur de
+vraies données (p50 / p99) et taille du fichier.
+
+Usage direct (utilisé par measure_serving) :
+    python serving_profile.py model.joblib X.npy --percentile 99 --engine numpy
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from forest_inference import load_predictor, ENGINES
+
+
+def _memory_mb():
+    # Mémoire résidente actuelle et pic du processus, en Mo (Linux) ; None ailleurs
+    try:
+        with open("/proc/self/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(status["VmRSS"].split()[0]) / 1024, int(status["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def profile(model_path, X, percentile=99, min_samples=500, engine="sklearn"):
+    """
+    Charge le modèle comme l'API (moteur `engine`) et prédit les lignes de X une
+    par une, en float32 comme le fait l'API (plusieurs passes jusqu'à
+    `min_samples` mesures), après une prédiction de préchauffage.
+    """
+    rss_before, _ = _memory_mb()
+    model, _ = load_predictor(model_path, engine)
+    rss_loaded, _ = _memory_mb()
+    X = np.asarray(X, dtype=np.float32)
+    model.predict(X[:1])
+
+    latencies = []
+    while len(latencies) < min_samples:
+        for row in X:
+            started = time.perf_counter()
+            model.predict(row[None, :])
+            latencies.append(time.perf_counter() - started)
+    latencies = 1000 * np.asarray(latencies)
+    rss, peak_rss = _memory_mb()
+
+    return {
+        "engine": engine,
+        "latency_percentile": percentile,
+        "latency_ms": float(np.percentile(latencies, percentile)),
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "n_samples": len(latencies),
+        "rss_mb": rss,
+        "peak_rss_mb": peak_rss,
+        "load_memory_mb": rss_loaded - rss_before if rss_before is not None else None,
+        "size_bytes": os.path.getsize(model_path)
+    }
+
+
+def measure_serving(model, X, percentile=99, min_samples=500, engine=None):
+    """
+    Profil de service de `model` (non encore sauvegardé) sur les lignes de X,
+    mesuré dans un sous-processus qui n'importe que ce module. Le moteur
+    d'inférence est celui de l'API (KIDNEY_INFERENCE_ENGINE) par défaut ; une
+    forêt compilée l'est avant la mesure, comme au redémarrage d'un worker.
+    """
+    engine = engine or os.environ.get("KIDNEY_INFERENCE_ENGINE", "sklearn")
+    with tempfile.TemporaryDirectory(prefix="kidney_serving_") as workdir:
+        model_path = os.path.join(workdir, "model.joblib")
+        X_path = os.path.join(workdir, "X.npy")
+        joblib.dump(model, model_path)
+        np.save(X_path, np.asarray(X))
+        if engine != "sklearn":
+            load_predictor(model_path, engine)
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), model_path, X_path, "--percentile", str(percentile),
+             "--min-samples", str(min_samples), "--engine", engine],
+            capture_output=True, text=True, check=True
+        )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model")
+    parser.add_argument("X")
+    parser.add_argument("--percentile", type=float, default=99)
+    parser.add_argument("--min-samples", type=int, default=500)
+    parser.add_argument("--engine", choices=ENGINES, default="sklearn")
+    args = parser.parse_args()
+
+    print(json.dumps(profile(args.model, np.load(args.X), args.percentile, args.min_samples, args.engine)))
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore")
+    main()
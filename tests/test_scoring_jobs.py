@@ -0,0 +1,53 @@
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring_jobs import JobStore, JobRunner, read_chunk, read_header  # noqa: E402
+
+
+DATASET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "kidney_disease.csv")
+
+
+def score_rows(model_version, chunk, first_id, output):
+    # Comme model.predict : un bloc vide est une erreur
+    if len(chunk) == 0:
+        raise ValueError("Found array with 0 sample(s)")
+    return "".join(f"{first_id + i}\n" for i in range(len(chunk)))
+
+
+def test_read_chunk_skips_blank_lines():
+    f = io.BytesIO(b"age,bp\n1,2\n\n\n3,4\n  \n\n")
+    header = f.readline()
+    chunk = read_chunk(f, header, 2, columns=["age", "bp"])
+    assert chunk["age"].tolist() == [1, 3]
+    assert read_chunk(f, header, 2, columns=["age", "bp"]) is None
+
+
+def test_job_with_trailing_blank_lines_at_chunk_boundary(tmp_path):
+    n_rows = len(pd.read_csv(DATASET))
+    with open(DATASET, "rb") as f:
+        content = f.read().rstrip(b"\n") + b"\n\n\n\n\n"
+
+    store = JobStore(str(tmp_path))
+    job = store.create(io.BytesIO(content), "kidney_disease.csv", chunk_rows=100)
+    assert read_header(store.input_path(job["id"])).startswith(b"id,")
+
+    runner = JobRunner(store, score_rows, lease_s=30, poll_interval_s=0.05)
+    runner.start()
+    try:
+        deadline = time.time() + 30
+        while store.get(job["id"])["status"] in ("queued", "running") and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        runner.stop()
+
+    job = store.get(job["id"])
+    assert job["status"] == "done", job["error"]
+    assert job["rows_done"] == n_rows
+    results = b"".join(store.iter_results(job["id"])).decode().split()
+    assert results == [str(i) for i in range(n_rows)]
@@ -0,0 +1,158 @@
+import os
+import platform
+
+import joblib
+from sklearn.base import clone
+
+
+# Cache local des modèles entraînés et de leurs métriques : un fichier joblib
+# par entrée, nommé par le hachage de tout ce qui détermine le résultat
+TRAINING_CACHE_DIR = "training_cache"
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+# Paramètres sans effet sur le modèle obtenu (seulement sur la vitesse)
+IGNORED_PARAMS = ("n_jobs", "nthread", "verbose", "verbosity")
+
+
+def library_versions():
+    import numpy
+    import sklearn
+
+    versions = {"python": platform.python_version(), "numpy": numpy.__version__, "sklearn": sklearn.__version__}
+    try:
+        import xgboost
+
+        versions["xgboost"] = xgboost.__version__
+    except ImportError:
+        pass
+    return versions
+
+
+def data_key(*arrays):
+    """
+    Hachage des tableaux passés aux modèles : données, prétraitement (scaler) et découpage compris.
+    """
+    return joblib.hash(arrays)
+
+
+def model_key(model):
+    params = clone(model).get_params()
+    params = {name: value for name, value in params.items() if name not in IGNORED_PARAMS}
+    return f"{type(model).__module__}.{type(model).__qualname__}", params
+
+
+def forest_key(forest):
+    """
+    Hachage d'une forêt entraînée, à partir des tableaux de ses arbres : deux
+    forêts de mêmes paramètres mais entraînées différemment n'ont pas la même
+    clé, et la clé ne change pas quand la forêt est sauvegardée puis relue.
+    """
+    return joblib.hash([
+        (tree.tree_.children_left, tree.tree_.children_right, tree.tree_.feature, tree.tree_.threshold, tree.tree_.value)
+        for tree in forest.estimators_
+    ])
+
+
+def cache_key(stage, model, data, **options):
+    """
+    Clé d'une entrée : étape ("train", "cv", "search"...), classe et
+    paramètres du modèle, hachage des données, options de l'étape et versions
+    des bibliothèques.
+    """
+    return joblib.hash((stage, model_key(model), data, sorted(options.items()), library_versions()))
+
+
+class TrainingCache():
+    """
+    Cache adressé par contenu des entraînements. Une entrée qui n'a pas servi
+    depuis le plus longtemps est supprimée dès que le cache dépasse `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=TRAINING_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.joblib")
+
+    def get(self, key):
+        """
+        Contenu de l'entrée `key`, ou None. Une entrée illisible (bibliothèque
+        changée, fichier tronqué) est supprimée et compte comme absente.
+        """
+        path = self.path(key)
+        try:
+            value = joblib.load(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            self._remove(path)
+            self.misses += 1
+            return None
+        # Date de dernier usage, pour l'éviction
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".joblib"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return sorted(entries)
+
+    def evict(self):
+        """
+        Supprime les entrées les moins récemment utilisées jusqu'à repasser sous `max_bytes`.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        n_evicted = 0
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(os.path.join(self.cache_dir, name))
+            total -= size
+            n_evicted += 1
+        return n_evicted
+
+    def clear(self):
+        """
+        Vide le cache : tous les modèles seront réentraînés.
+        """
+        entries = self.entries()
+        for _, _, name in entries:
+            self._remove(os.path.join(self.cache_dir, name))
+        return len(entries)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }